@@ -0,0 +1,109 @@
+"""
+Benchmark `DecodeFeature.decode_PRICE` and `DecodeFeature.decode_AREA` against the
+previous implementations on a synthetic upload.
+
+```sh
+python -m benchmarks.decode_price_area --rows 1000000
+```
+"""
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.core import constants as C
+from src.data.decode_feature import DecodeFeature
+
+
+def make_upload(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Synthetic lowercased PRICE and AREA columns with `n_rows` rows."""
+    rng = np.random.default_rng(seed)
+    units = rng.choice([" cr", " l", ""], n_rows, p=[0.3, 0.6, 0.1])
+    amounts = np.where(
+        units == " cr",
+        rng.uniform(0.5, 5, n_rows).round(2),
+        np.where(
+            units == " l",
+            rng.uniform(10, 99, n_rows).round(1),
+            rng.integers(5000, 90000, n_rows),
+        ),
+    )
+    price = pd.Series([f"{a}{u}" for a, u in zip(amounts, units)])
+    odd = rng.random(n_rows)
+    price[odd < 0.01] = "price on request"
+    price[(odd >= 0.01) & (odd < 0.02)] = "45 l onwards"
+    price[(odd >= 0.02) & (odd < 0.03)] = "1.2 - 1.5 cr"
+    price[(odd >= 0.03) & (odd < 0.04)] = "3 bedroom"
+
+    sqft = rng.integers(300, 5000, n_rows)
+    area = pd.Series([f"{a} sq.ft. ({a / 10.76:.2f} sq.m.)" for a in sqft])
+    area[rng.random(n_rows) < 0.01] = "1000-1500 sq.ft."
+    area[rng.random(n_rows) < 0.01] = "2 acre"
+    return pd.DataFrame({"PRICE": price, "AREA": area})
+
+
+def legacy_decode(df: pd.DataFrame) -> pd.DataFrame:
+    """Previous implementation: six `str.contains` scans, three drops and an `apply`."""
+    df = df.copy()
+    df["PRICE"] = df["PRICE"].str.replace(",", "")
+    df.drop(
+        index=df[
+            df["PRICE"].str.contains("bed", regex=False)
+            | df["PRICE"].str.contains("request", regex=False)
+            | df["PRICE"].str.contains("-", regex=False)
+            | df["PRICE"].str.contains("onwards", regex=False)
+        ].index,
+        inplace=True,
+    )
+
+    def handle_price(x: str) -> str | float:
+        price = None
+        if " cr" in x:
+            price = round(float(x.split(" ")[0]) * C.CRORE, 2)
+        elif " l" in x:
+            price = round(float(x.split(" ")[0]) * C.LAKH, 2)
+        return price if price else x
+
+    df["PRICE"] = df["PRICE"].apply(handle_price).astype(float)
+
+    df = df.drop(index=df[~df["AREA"].str.contains("sq.ft.", regex=False)].index).drop(
+        index=df[df["AREA"].str.contains("-")].index
+    )
+    df["AREA"] = df["AREA"].str.split(" ").str.get(0).astype(float)
+    return df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    df = make_upload(args.rows)
+    print(f"Rows: {args.rows:,}")
+
+    start = time.perf_counter()
+    expected = legacy_decode(df)
+    legacy_time = time.perf_counter() - start
+    print(f"Legacy     : {legacy_time:8.2f}s ({args.rows / legacy_time:,.0f} rows/s)")
+
+    decoder = DecodeFeature(df.copy())
+    others = [
+        i for i in decoder.all_methods if i not in ("decode_AREA", "decode_PRICE")
+    ]
+    start = time.perf_counter()
+    out = decoder.run_all(*others)
+    vectorized_time = time.perf_counter() - start
+    print(
+        f"Vectorized : {vectorized_time:8.2f}s ({args.rows / vectorized_time:,.0f} "
+        f"rows/s, {legacy_time / vectorized_time:.1f}x)"
+    )
+    print(f"Rejections : {decoder.rejections}")
+
+    pd.testing.assert_frame_equal(out, expected)
+    print("Outputs are identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark `DecodeFeature.decode_FORMATTED_LANDMARK_DETAILS` against the previous
+per-row implementation on a synthetic upload.
+
+```sh
+python -m benchmarks.landmarks --rows 1000000
+```
+"""
+
+import argparse
+import time
+from ast import literal_eval
+
+import numpy as np
+import pandas as pd
+
+from src.data import _utils
+from src.data.decode_feature import DecodeFeature
+
+LANDMARK_NAMES = [
+    "hospitals",
+    "pharmacies",
+    "education institutes",
+    "libraries",
+    "metro stations",
+    "bus stops",
+    "airports",
+    "shopping malls",
+    "shops",
+    "parks",
+    "parking",
+    "golf courses",
+    "hotels",
+    "offices",
+    "atms",
+    "banks",
+    "religious places",
+    "connectivity",
+    "miscellaneous",
+    "children's play area",
+]
+
+
+def make_details(n_rows: int, seed: int = 42) -> pd.Series:
+    """Synthetic FORMATTED_LANDMARK_DETAILS column with `n_rows` rows."""
+    rng = np.random.default_rng(seed)
+    n_landmarks = rng.integers(0, 8, n_rows)
+    names = rng.choice(LANDMARK_NAMES, n_landmarks.sum())
+    counts = rng.integers(1, 20, n_landmarks.sum())
+
+    texts = [
+        repr({"text": f"{c} {n}", "category": "nearby"}) for c, n in zip(counts, names)
+    ]
+    offsets = np.concatenate([[0], np.cumsum(n_landmarks)])
+    details = pd.Series(
+        ["[" + ", ".join(texts[i:j]) + "]" for i, j in zip(offsets[:-1], offsets[1:])]
+    )
+    details[rng.random(n_rows) < 0.05] = np.nan
+    return details
+
+
+def legacy_decode(details: pd.Series) -> pd.DataFrame:
+    """Previous implementation: one `literal_eval` and six `apply` passes."""
+    texts = (
+        details.fillna("[]")
+        .apply(literal_eval)
+        .apply(lambda x: [i.get("text") for i in x])
+    )
+    out = {}
+    for col_name, keys in _utils.LANDMARKS_GROUPS.items():
+        out[col_name] = texts.apply(
+            lambda x: sum(
+                int(i.split(" ")[0])
+                for i in x
+                for j in keys
+                if j in i and isinstance(i, str)
+            )
+        ).to_numpy()
+    return pd.DataFrame(out)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    details = make_details(args.rows)
+    print(f"Rows: {args.rows:,}")
+
+    start = time.perf_counter()
+    expected = legacy_decode(details)
+    legacy_time = time.perf_counter() - start
+    print(f"Legacy     : {legacy_time:8.2f}s")
+
+    df = pd.DataFrame({"FORMATTED_LANDMARK_DETAILS": details})
+    start = time.perf_counter()
+    DecodeFeature(df).decode_FORMATTED_LANDMARK_DETAILS()
+    vectorized_time = time.perf_counter() - start
+    print(
+        f"Vectorized : {vectorized_time:8.2f}s ({legacy_time / vectorized_time:.1f}x)"
+    )
+
+    cols = list(_utils.LANDMARKS_GROUPS)
+    assert (df[cols].to_numpy() == expected[cols].to_numpy()).all(), "Outputs differ."
+    print("Outputs are identical.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark the sparse one-hot encoding of `PricePredictor` against the dense one.
+
+```sh
+python -m benchmarks.sparse_ohe --prop-type res_apartment --n-jobs 4
+```
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+from scipy import sparse
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+
+from src.ml.price_predictor import PricePredictor
+from src.property.entity import ALL_PROPERTY
+
+
+def matrix_nbytes(X) -> int:
+    if sparse.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    return X.nbytes
+
+
+def run(predictor: PricePredictor, X_train, X_test, y_train, y_test) -> dict:
+    tracemalloc.start()
+    start = time.perf_counter()
+    pipeline = predictor.fit(X_train, y_train)
+    fit_time = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    y_pred = pipeline.predict(X_test)
+    predict_time = time.perf_counter() - start
+
+    Xt = pipeline[:-1].transform(X_train)
+    return {
+        "matrix": f"{Xt.shape} {matrix_nbytes(Xt) / 2**20:.1f}MB",
+        "fit": f"{fit_time:.2f}s",
+        "peak_mem": f"{peak / 2**20:.1f}MB",
+        "predict": f"{predict_time:.2f}s",
+        "r2": f"{r2_score(y_test, y_pred):.4f}",
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prop-type", default="res_apartment")
+    parser.add_argument("--dataset-type", default="main")
+    parser.add_argument("--n-jobs", type=int, default=None)
+    args = parser.parse_args()
+
+    prop = ALL_PROPERTY[args.prop_type]
+    X, y = PricePredictor(prop, args.dataset_type).load_dataset()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.25, random_state=42
+    )
+    print(f"Rows: {len(X):,} ({args.dataset_type}/{args.prop_type})")
+
+    for sparse_ in (False, True):
+        predictor = PricePredictor(prop, args.dataset_type, args.n_jobs, sparse_)
+        np.random.seed(42)
+        result = run(predictor, X_train, X_test, y_train, y_test)
+        name = "Sparse" if sparse_ else "Dense"
+        print(f"{name:<6}: " + ", ".join(f"{k} {v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,11 @@ import pandas as pd
 import streamlit as st
 
 from src.core.errors import ModelNotFoundError
+from src.core.jobs import Job, job_manager
+from src.ml import model_details, orchestrator
 from src.ml.price_predictor import PricePredictor
 from src.property import _utils as prop_utils
+from src.property import listing_index, locality_stats, spatial_index
 from src.property.entity import ALL_PROPERTY
 from src.property.form_options import form_options
 from src.property.property_type import PropertyType
@@ -37,6 +40,23 @@ st.subheader(
 selected_property = ALL_PROPERTY[prop_type]
 price_predictor = PricePredictor(selected_property, dataset_type)
 
+
+def submit_train_job() -> None:
+    job_manager.submit(
+        "train", orchestrator.train_job, prop_type=prop_type, dataset_type=dataset_type
+    )
+
+
+def is_training(job: Job) -> bool:
+    return job.kind == "train_all" or (
+        job.params.get("prop_type") == prop_type
+        and job.params.get("dataset_type") == dataset_type
+    )
+
+
+# Models are trained by background jobs, the current model is served until replaced
+training = any(map(is_training, job_manager.jobs(active_only=True)))
+
 # Button to train model of the selected property
 if not prop_utils.get_model_path(
     selected_property.prop_type, dataset_type, "price_predictor"
@@ -44,19 +64,89 @@ if not prop_utils.get_model_path(
     st.sidebar.button(
         "🚆 Train Model 🚆",
         use_container_width=True,
-        on_click=price_predictor.train,
+        on_click=submit_train_job,
         type="primary",
+        disabled=training,
     )
 else:
-    with st.spinner("Re-Training in progress..."):
-        _ = st.sidebar.button(
-            "🚆 Re-Train Model 🚆",
-            use_container_width=True,
-        )
-        if _:
-            price_predictor.train()
-            st_msg.info("Model Re-trained successfully.", icon="🚅")
+    st.sidebar.button(
+        "🚆 Re-Train Model 🚆",
+        use_container_width=True,
+        on_click=submit_train_job,
+        disabled=training,
+    )
+    # Scores are appended into `models/<dataset_type>/price_predictor.json`
+    st.sidebar.button(
+        "📊 Evaluate Model 📊",
+        use_container_width=True,
+        on_click=job_manager.submit,
+        args=("evaluate", model_details.evaluate_job),
+        kwargs={"dataset_type": dataset_type, "prop_types": [prop_type]},
+        disabled=training,
+    )
 
+# Button to train the models of all properties in parallel
+st.sidebar.button(
+    "🚆 Train All Models 🚆",
+    use_container_width=True,
+    on_click=job_manager.submit,
+    args=("train_all", orchestrator.train_all_job),
+    disabled=bool(job_manager.jobs("train_all", active_only=True)),
+)
+
+
+@st.fragment(run_every="2s")
+def show_training_jobs() -> None:
+    """Progress of the active and the latest finished training jobs."""
+    jobs = job_manager.jobs(active_only=True) or job_manager.jobs()[:1]
+    for job in jobs:
+        label = " / ".join([job.kind, *map(str, job.params.values())])
+        with st.expander(f"{label} — {job.status}", expanded=job.is_active):
+            if job.stages:
+                st.dataframe(
+                    pd.DataFrame([i.model_dump() for i in job.stages]),
+                    hide_index=True,
+                    use_container_width=True,
+                )
+            if job.error:
+                st.code(job.error)
+            if job.is_active:
+                st.button(
+                    "Cancel",
+                    key=f"cancel_{job.id}",
+                    on_click=job_manager.cancel,
+                    args=(job.id,),
+                    use_container_width=True,
+                )
+
+
+with st.sidebar:
+    show_training_jobs()
+
+
+def lookup_listing(prop_id: str) -> None:
+    """Stored row of the listing `prop_id` along with its predicted price."""
+    if (found := listing_index.lookup(dataset_type, prop_id)) is None:
+        st.warning(f"'{prop_id}' is not in the {dataset_type} datasets.")
+        return
+
+    listing_type, row = found
+    st.caption(st_pages.decorate_options(listing_type))
+    st.dataframe(row.T.astype(str), use_container_width=True)
+
+    predictor = PricePredictor(ALL_PROPERTY[listing_type], dataset_type)
+    try:
+        pred_price = predictor.predict(row)
+    except ModelNotFoundError as e:
+        st.error(e, icon="🤖")
+        return
+    st.metric("Predicted Price", st_pages.format_price(pred_price))
+    st.metric("Listed Price", st_pages.format_price(row["PRICE"].iloc[0]))
+
+
+with st.sidebar.expander("🔎 Lookup Listing"):
+    if prop_id := st.text_input("PROP_ID", placeholder="e.g. R70515244"):
+        lookup_listing(prop_id)
 
 st.selectbox(
     "Select City",
@@ -118,8 +208,9 @@ except ModelNotFoundError as e:
     st_msg.button(
         "🚆 Train Model 🚆",  # Applied `**` to provide unique key
         use_container_width=True,
-        on_click=price_predictor.train,
+        on_click=submit_train_job,
         type="secondary",
+        disabled=training,
     )
     st.toast("Are you in a hurry?", icon="🚅")
 
@@ -129,3 +220,26 @@ st.subheader(
     st_pages.colorizer(f"Prediction is {st_pages.format_price(pred_price)}"),
     divider="rainbow",
 )
+
+# --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
+# Comparable Listings
+# --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
+stats = locality_stats.load(prop_type, dataset_type)
+point = (
+    None
+    if stats is None
+    else locality_stats.centroid(
+        stats, st.session_state["CITY"], st.session_state["LOCALITY_NAME"]
+    )
+)
+if point is not None:
+    bhk = df["BEDROOM_NUM"].iloc[0] if "BEDROOM_NUM" in df else None
+    comparables = spatial_index.load(prop_type, dataset_type).nearest(
+        *point, k=10, bhk=bhk
+    )
+    st.subheader(":blue[🏘️ Comparable Listings Nearby]", divider="blue")
+    st.dataframe(
+        comparables.drop(columns=["LATITUDE", "LONGITUDE"]).round(2),
+        hide_index=True,
+        use_container_width=True,
+    )
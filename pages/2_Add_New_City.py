@@ -1,9 +1,11 @@
 import pandas as pd
 import streamlit as st
 
+from src.core import constants as C
 from src.core.errors import DataValidationError
 from src.data import validate
 from src.data.cleaner import DataCleaner
+from src.data.streaming import IngestSummary, StreamingDataCleaner
 from src.property.entity import ALL_PROPERTY
 from src.typing import stop as _stop
 
@@ -27,75 +29,89 @@ if uploaded is None:
     st_msg.error("Uploaded file is gives None to streamlit.")
     _stop()
 
-df = pd.read_csv(uploaded)
+if uploaded.size > C.STREAMING_UPLOAD_BYTES:
+    # Large uploads are cleaned and dumped chunk by chunk
+    try:
+        with st.spinner("Your Dataset is Cleaning in chunks..."):
+            cleaner = StreamingDataCleaner(
+                pd.read_csv(uploaded, chunksize=C.INGEST_CHUNK_SIZE),
+                skip_known="user" if extend else None,
+            )
+            summary = cleaner.initiate("user", extend)
+    except DataValidationError as e:
+        st.toast("Something went wrong!", icon="😵‍💫")
+        st_msg.error(e, icon="🔥")
+        _stop()
 
-# Validate the user's dataset for further progress
-try:
-    validate.validate_dataset(df)
-except DataValidationError as e:
-    st.toast("Something went wrong!", icon="😵‍💫")
-    st_msg.error(e, icon="🔥")
-    _stop()
+    st.toast("Your dataset is cleaned.", icon="🤓")
+    if not summary.n_rows:
+        st_msg.info(f"All the {cleaner.n_known} listings are already stored.")
+        _stop()
+else:
+    df = pd.read_csv(uploaded)
+
+    # Validate the user's dataset for further progress
+    try:
+        validate.validate_dataset(df)
+    except DataValidationError as e:
+        st.toast("Something went wrong!", icon="😵‍💫")
+        st_msg.error(e, icon="🔥")
+        _stop()
+
+    # Clean the dataset with step first cleaning
+    with st.spinner("Your Dataset is Cleaning..."):
+        cleaner = DataCleaner(df, skip_known="user" if extend else None)
+        df = cleaner.initiate()
 
-# Clean the dataset with step first cleaning
-with st.spinner("Your Dataset is Cleaning..."):
-    cleaner = DataCleaner(df)
-    df = cleaner.initiate()
+    st.toast("Your dataset is cleaned.", icon="🤓")
+    if df.empty:
+        st_msg.info(f"All the {cleaner.n_known} listings are already stored.")
+        _stop()
 
-st.toast("Your dataset is cleaned.", icon="🤓")
+    # Split dataset into different properties
+    for i, prop in enumerate(ALL_PROPERTY.values(), 1):
+        prop_df = prop.extract_this_property(df)
+        prop.dump_dataframe(prop_df, "user", extend)
 
-# Split dataset into different properties
-for i, prop in enumerate(ALL_PROPERTY.values(), 1):
-    prop_df = prop.extract_this_property(df)
-    prop.dump_dataframe(prop_df, "user", extend)
+    summary = IngestSummary()
+    summary.update(df)
 
 # --- --- Uploaded dataset summary --- --- #
 st.header("📊 :red[Dataset Summary]", divider="red")
 
 l, m1, m2, r = st.columns(4)
-l.metric(":blue[**Shape of data**]", str(df.shape))
-m1.metric(":blue[**No. of Cities**]", df["CITY"].nunique())
-m2.metric(":blue[**No. of PropertyTypes**]", df["PROPERTY_TYPE"].nunique())
+l.metric(":blue[**Shape of data**]", str(summary.shape))
+m1.metric(":blue[**No. of Cities**]", summary.nunique("CITY"))
+m2.metric(":blue[**No. of PropertyTypes**]", summary.nunique("PROPERTY_TYPE"))
+
+st.write(f":blue[**Columns:**] `{summary.columns}`")
+st.caption(
+    f"Already stored listings skipped: {cleaner.n_known}, "
+    "Rows parsed with `literal_eval` fallback: "
+    + ", ".join(f"`{k}`: {v}" for k, v in cleaner.parse_fallbacks.items())
+)
+st.caption(
+    "Rows rejected while decoding: "
+    + ", ".join(
+        f"`{col}` ({', '.join(f'{k}: {v}' for k, v in counts.items())})"
+        for col, counts in cleaner.rejections.items()
+    )
+)
 
-st.write(f":blue[**Columns:**] `{df.columns.tolist()}`")
+with st.expander(f"⏱️ Cleaning took {cleaner.profile.wall_time:.2f}s, by stage"):
+    st.dataframe(
+        cleaner.profile.to_frame().set_index("name").round(3),
+        use_container_width=True,
+    )
 
 l, r = st.columns(2)
 # Insights about CITY column
 l.subheader(":blue[Insights about Cities]", divider="blue")
-grp_by_city = df.groupby("CITY")
-l.dataframe(
-    (
-        grp_by_city.aggregate(
-            {
-                "PROP_ID": "count",
-                "PRICE": "mean",
-                "AREA": "mean",
-            }
-        )
-        .astype(int)
-        .sort_values("PROP_ID", ascending=False)
-    ),
-    use_container_width=True,
-    height=178,
-)
+l.dataframe(summary.insights("CITY"), use_container_width=True, height=178)
 
 # Insights about PROPERTY_TYPE column
 r.subheader(":blue[Insights about PropertyTypes]", divider="blue")
-grp_by_prop_type = df.groupby("PROPERTY_TYPE")
-r.dataframe(
-    (
-        grp_by_prop_type.aggregate(
-            {
-                "PROP_ID": "count",
-                "PRICE": "mean",
-                "AREA": "mean",
-            }
-        )
-        .astype(int)
-        .sort_values("PROP_ID", ascending=False)
-    ),
-    use_container_width=True,
-)
+r.dataframe(summary.insights("PROPERTY_TYPE"), use_container_width=True)
 
 st.link_button(
     "**Click For More Insights**",
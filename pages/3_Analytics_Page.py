@@ -1,16 +1,19 @@
 from warnings import filterwarnings
 
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import streamlit as st
 from plotly.graph_objects import Figure
 
+from src.core import constants as C
 from src.core import io
 from src.property import _utils as prop_utils
+from src.property import locality_stats, spatial_index
 from src.property.entity import ALL_PROPERTY
 from src.typing import DatasetType, PropertyAlias
 from src.typing import stop as _stop
-from src.utils import st_pages
+from src.utils import plots, st_pages
 
 filterwarnings("ignore", category=UserWarning)
 
@@ -35,11 +38,18 @@ prop_type: PropertyAlias = st.sidebar.radio(
 
 selected_property = ALL_PROPERTY[prop_type]
 
-try:
-    prop_df = io.read_csv(
-        prop_utils.get_dataset_path(selected_property.prop_type, dataset_type)
-    )
-except FileNotFoundError:
+# Columns of the listings used for the plots, others are never read from disk
+ANALYTICS_COLS = [
+    "PROP_ID",
+    "PRICE",
+    "AREA",
+    "BEDROOM_NUM",
+    "FLOOR_NUM",
+    "LUXURY_CATEGORY",
+]
+
+dataset_path = prop_utils.get_dataset_path(selected_property.prop_type, dataset_type)
+if not io.dataset_exists(dataset_path):
     st.columns([0.1, 0.8, 0.1])[1].image(
         "https://indianmemetemplates.com/wp-content/uploads/Bhai-kya-kar-raha-hai-tu.jpg",
         caption="Upload your data!!",
@@ -48,22 +58,64 @@ except FileNotFoundError:
     st.toast("Data upload kar bhai!", icon="🤦")
     _stop()
 
+# Cached functions are keyed by the dataset version instead of hashing dataframes
+version = io.dataset_version(dataset_path)
+
+# Reset the timings of the cached functions on every run
+st.session_state[st_pages.CACHE_TIMINGS] = []
+cache_timings_box = st.sidebar.empty()
+
+
+def show_cache_timings() -> None:
+    timings = st.session_state[st_pages.CACHE_TIMINGS]
+    with cache_timings_box.expander("⏱️ Cache Timings"):
+        st.dataframe(
+            pd.DataFrame([i.model_dump() for i in timings]).round(2),
+            hide_index=True,
+            use_container_width=True,
+        )
+
+
+@st_pages.timed_cache_data
+def get_locality_stats(
+    prop_type: PropertyAlias, dataset_type: DatasetType, version: str
+) -> pd.DataFrame:
+    stats = locality_stats.load(prop_type, dataset_type)
+    if stats is None:  # Dataset stored before the aggregates existed
+        stats = locality_stats.rebuild(prop_type, dataset_type)
+    return stats
+
+
+@st_pages.timed_cache_data
+def get_city_listings(
+    prop_type: PropertyAlias, dataset_type: DatasetType, version: str, city: str
+) -> pd.DataFrame:
+    prop_df = io.read_dataset(
+        prop_utils.get_dataset_path(prop_type, dataset_type),
+        columns=ANALYTICS_COLS,
+        filters=[("CITY", "==", city)],
+    )
+    prop_df["PRICE_PER_SQFT"] = prop_df["PRICE"].div(prop_df["AREA"])
+    return prop_df
+
+
+stats_df = get_locality_stats(prop_type, dataset_type, version)
+
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
 # ⚙️ Configuration for Analysis
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
 st.header(":red[⚙️ Configuration for Analysis]", divider="red")
 city: str = st.selectbox(
     "🌇 Select City",
-    options=(_ := prop_df["CITY"].unique()),
+    options=(_ := stats_df["CITY"].unique()),
     format_func=lambda x: x.title(),
     disabled=True if len(_) == 1 else False,
 )  # type: ignore
 
 st.divider()
 
-# --- --- Filter and Update Dataset --- --- #
-prop_df = prop_df.query("CITY==@city")
-prop_df["PRICE_PER_SQFT"] = prop_df["PRICE"].div(prop_df["AREA"])
+# --- --- Filter Aggregates --- --- #
+stats_df = stats_df.query("CITY==@city")
 
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
 # Visualizations with Plotly Mapbox
@@ -77,20 +129,35 @@ mapbox_bhk: int | None = None
 if prop_type != "res_land":
     mapbox_bhk = st.selectbox(
         "Select BHK",
-        options=[0] + sorted(prop_df["BEDROOM_NUM"].unique().tolist()),
+        options=sorted(stats_df["BEDROOM_NUM"].unique().tolist()),
         format_func=lambda x: f"{int(x)} BHK".replace("99", "5+").replace(
             "0 BHK", "Overall"
         ),
     )  # type: ignore
 
 
-@st.cache_data
-def get_df_for_scatter_map(df: pd.DataFrame, mapbox_bhk: int | None) -> pd.DataFrame:
-    filter_with_bhk = df.query("BEDROOM_NUM==@mapbox_bhk") if mapbox_bhk else df
-
-    curr_df = filter_with_bhk.groupby("LOCALITY_NAME")[
-        ["AREA", "PRICE", "PRICE_PER_SQFT", "LATITUDE", "LONGITUDE"]
-    ].mean()
+@st_pages.timed_cache_data
+def get_df_for_scatter_map(
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    version: str,
+    city: str,
+    mapbox_bhk: int | None,
+) -> pd.DataFrame:
+    """Mean of each locality, from the rows of `mapbox_bhk` of the aggregates."""
+    bhk = mapbox_bhk or locality_stats.ALL_BHK
+    curr_df = (
+        get_locality_stats(prop_type, dataset_type, version)
+        .query(
+            "CITY==@city and BEDROOM_NUM==@bhk",
+            local_dict={"city": city, "bhk": bhk},
+        )
+        .set_index("LOCALITY_NAME")[
+            [f"{i}_MEAN" for i in ["AREA", "PRICE", "PRICE_PER_SQFT"]]
+            + ["LATITUDE_MEAN", "LONGITUDE_MEAN"]
+        ]
+        .rename(columns=lambda x: x.removesuffix("_MEAN"))
+    )
 
     curr_df[["AREA", "PRICE", "PRICE_PER_SQFT"]] = curr_df[
         ["AREA", "PRICE", "PRICE_PER_SQFT"]
@@ -98,20 +165,27 @@ def get_df_for_scatter_map(df: pd.DataFrame, mapbox_bhk: int | None) -> pd.DataF
     return curr_df
 
 
-curr_df = get_df_for_scatter_map(prop_df, mapbox_bhk)
+curr_df = get_df_for_scatter_map(prop_type, dataset_type, version, city, mapbox_bhk)
 with st.expander("👀 See the data used to make the scatter map."):
     st.dataframe(curr_df.sort_values("PRICE"), use_container_width=True)
 
 
-@st.cache_data
-def plot_scatter_mapbox(df: pd.DataFrame) -> Figure:
+@st_pages.timed_cache_data
+def plot_scatter_mapbox(
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    version: str,
+    city: str,
+    mapbox_bhk: int | None,
+) -> Figure:
+    df = get_df_for_scatter_map(prop_type, dataset_type, version, city, mapbox_bhk)
     fig = px.scatter_mapbox(
         data_frame=df,
         lat="LATITUDE",
         lon="LONGITUDE",
         color_continuous_scale=px.colors.cyclical.IceFire,
-        hover_name=curr_df.index.str.title(),
-        center=st_pages.get_center_lat_lon(curr_df),
+        hover_name=df.index.str.title(),
+        center=st_pages.get_center_lat_lon(df),
         opacity=0.7,
         zoom=10,
         height=700,
@@ -123,34 +197,106 @@ def plot_scatter_mapbox(df: pd.DataFrame) -> Figure:
     return fig
 
 
-st.plotly_chart(plot_scatter_mapbox(curr_df), True)
+st.plotly_chart(
+    plot_scatter_mapbox(prop_type, dataset_type, version, city, mapbox_bhk), True
+)
+
+with st.expander("🔍 See the listings around a locality."):
+    l, r = st.columns(2)
+    around: str = l.selectbox(
+        "Locality",
+        options=stats_df["LOCALITY_NAME"].sort_values().unique().tolist(),
+        format_func=lambda x: x.title(),
+    )  # type: ignore
+    radius_km: float = r.slider("Radius (km)", 0.5, 5.0, 1.0, 0.5)
+
+    if (point := locality_stats.centroid(stats_df, city, around)) is not None:
+        # Viewport of the spatial index, the city listings are never scanned
+        d_lat = radius_km / 111.32
+        d_lon = d_lat / np.cos(np.radians(point[0]))
+        listings = spatial_index.load(prop_type, dataset_type).viewport(
+            point[0] - d_lat, point[1] - d_lon, point[0] + d_lat, point[1] + d_lon
+        )
+        st.caption(f"{len(listings)} listings")
+        fig = px.scatter_mapbox(
+            plots.stratified_sample(listings),
+            lat="LATITUDE",
+            lon="LONGITUDE",
+            color="PRICE",
+            hover_name="PROP_ID",
+            hover_data=["LOCALITY_NAME", "AREA"],
+            center={"lat": point[0], "lon": point[1]},
+            zoom=13,
+            height=500,
+            mapbox_style="open-street-map",
+        )
+        st.plotly_chart(fig, True)
 
 
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
 # Optimized Functions
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
-@st.cache_data
-def plot_bar(df: pd.DataFrame, x: list[str], y: str | None, **kwargs) -> Figure:
-    fig = px.bar(df, x=x, y=y, **kwargs)
+@st_pages.timed_cache_data
+def get_bhk_means(
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    version: str,
+    city: str,
+    locality: str,
+) -> pd.DataFrame:
+    stats_df = get_locality_stats(prop_type, dataset_type, version).query(
+        "CITY==@city"
+        if locality == "Overall"
+        else "CITY==@city and LOCALITY_NAME==@locality"
+    )
+    curr_df = locality_stats.bhk_means(stats_df).astype(int)
+    curr_df.index = curr_df.index.map(lambda x: "More than 5" if x == 99 else x)
+    return curr_df
+
+
+@st_pages.timed_cache_data
+def plot_bar(
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    version: str,
+    city: str,
+    locality: str,
+    y: str,
+) -> Figure:
+    df = get_bhk_means(prop_type, dataset_type, version, city, locality)
+    fig = px.bar(df, x=df.index.tolist(), y=y, labels={"x": "BEDROOM_NUM"})
     return fig
 
 
-@st.cache_data
+@st_pages.timed_cache_data
 def plot_scatter(
-    df: pd.DataFrame,
-    x: str | None,
-    y: str | None,
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    version: str,
+    city: str,
+    x: str,
     color: str | None,
-    hover_name: str | None,
-    **kwargs,
+    mode: plots.ScatterMode,
 ) -> Figure:
-    fig = px.scatter(df, x=x, y=y, color=color, hover_name=hover_name, **kwargs)
+    df = get_city_listings(prop_type, dataset_type, version, city)
+    fig = plots.scatter(
+        df, x=x, y="PRICE", color=color, hover_name="PROP_ID", mode=mode
+    )
     return fig
 
 
-@st.cache_data
-def plot_box(df: pd.DataFrame, x: str | None, y: str | None, **kwargs) -> Figure:
-    fig = px.box(df, x=x, y=y, **kwargs)
+@st_pages.timed_cache_data
+def plot_box(
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    version: str,
+    city: str,
+    x: str | None,
+    y: str,
+) -> Figure:
+    # Quantiles are computed here, the raw points are never sent to the browser
+    df = get_city_listings(prop_type, dataset_type, version, city)
+    fig = plots.box(df, x=x, y=y)
     return fig
 
 
@@ -159,6 +305,7 @@ def plot_box(df: pd.DataFrame, x: str | None, y: str | None, **kwargs) -> Figure
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
 if prop_type == "res_land":
     st.info(f"No BHK comparison for {st_pages.decorate_options(prop_type)}", icon="🥹")
+    show_cache_timings()
     _stop()
 
 st.subheader(
@@ -167,23 +314,12 @@ st.subheader(
 
 locality: str = st.selectbox(
     "Select Sector",
-    options=["Overall"] + prop_df["LOCALITY_NAME"].sort_values().unique().tolist(),
+    options=["Overall"] + stats_df["LOCALITY_NAME"].sort_values().unique().tolist(),
     format_func=lambda x: x.title(),
     key="LOCALITY_NAME",
 )  # type: ignore
 
-curr_df = (
-    prop_df
-    if locality == "Overall"
-    else prop_df.query("LOCALITY_NAME==@locality").copy()
-)
-curr_df["BEDROOM_NUM"] = curr_df["BEDROOM_NUM"].replace(99, "More than 5")
-
-curr_df = (
-    curr_df.groupby("BEDROOM_NUM")[["PRICE", "AREA", "PRICE_PER_SQFT"]]
-    .mean()
-    .astype(int)
-)
+curr_df = get_bhk_means(prop_type, dataset_type, version, city, locality)
 
 with st.expander("👀 See the data used to make below plot."):
     st.dataframe(curr_df.T, use_container_width=True)
@@ -194,12 +330,7 @@ _ = st.columns([0.35, 0.7])[-1].radio(
     horizontal=True,
     label_visibility="collapsed",
 )
-fig = plot_bar(
-    curr_df,
-    x=curr_df.index.tolist(),
-    y=_,
-    labels={"x": "BEDROOM_NUM"},
-)
+fig = plot_bar(prop_type, dataset_type, version, city, locality, y=_)
 st.plotly_chart(fig, True)
 
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
@@ -230,7 +361,20 @@ x_ = st.radio(
     horizontal=True,
 )
 
-fig = plot_scatter(prop_df, x=x_, y="PRICE", color=color_, hover_name="PROP_ID")
+# Large cities are sampled or binned, so the plot size is bounded
+n_listings = len(get_city_listings(prop_type, dataset_type, version, city))
+scatter_mode: plots.ScatterMode = "sampled"
+if n_listings > C.SCATTER_MAX_POINTS:
+    scatter_mode = st.radio(
+        f"{n_listings} listings, plot a sample or their density",
+        options=["sampled", "density"],
+        format_func=str.title,
+        horizontal=True,
+    )  # type: ignore
+
+fig = plot_scatter(
+    prop_type, dataset_type, version, city, x=x_, color=color_, mode=scatter_mode
+)
 st.plotly_chart(fig, True)
 
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
@@ -261,5 +405,7 @@ y_ = st.radio(
     horizontal=True,
 )
 
-fig = plot_box(prop_df, x=x_, y=y_)
+fig = plot_box(prop_type, dataset_type, version, city, x=x_, y=y_)
 st.plotly_chart(fig, True)
+
+show_cache_timings()
@@ -1,5 +1,10 @@
+import zipfile
+from io import BytesIO
+from pathlib import Path
+
 import streamlit as st
 
+from src.core import io
 from src.property import _utils as prop_utils
 from src.property.entity import ALL_PROPERTY
 from src.utils import st_pages
@@ -28,6 +33,15 @@ st.selectbox(
     key="ModelType",
 )
 
+st.radio(
+    "Select **Model Format**",
+    options=["dill", "compact"],
+    format_func=lambda x: {"dill": "Pipeline (.dill)", "compact": "Compact (.zip)"}[x],
+    help="Compact models store the trees as NumPy arrays, see `src.ml.compact`.",
+    horizontal=True,
+    key="ModelFormat",
+)
+
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
 st.divider()
 # --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- --- #
@@ -37,13 +51,43 @@ l.subheader(st_pages.colorizer("Download Models", "blue"), divider="blue")
 r.subheader(st_pages.colorizer("Download Datasets", "blue"), divider="blue")
 
 
+@st.cache_data
+def dataset_as_csv(fp: Path, mtime_ns: int) -> bytes:
+    """Datasets are stored in a columnar format, serve them as `.csv` file."""
+    return io.read_dataset(fp).to_csv(index=False).encode()
+
+
+@st.cache_data(max_entries=2)
+def compact_model_as_zip(dir_path: Path, mtime_ns: int) -> bytes:
+    """Compact models are directories, serve them as `.zip` file."""
+    buffer = BytesIO()
+    with zipfile.ZipFile(buffer, "w") as zf:
+        for fp in sorted(dir_path.glob("*")):
+            zf.write(fp, fp.name)
+    return buffer.getvalue()
+
+
 for i, (prop_type_, prop) in enumerate(ALL_PROPERTY.items()):
     # Download buttons for model
-    model_path = prop_utils.get_model_path(
-        prop.prop_type, dataset_type, st.session_state["ModelType"]
-    )
+    if st.session_state["ModelFormat"] == "compact":
+        model_path = prop_utils.get_compact_model_path(
+            prop.prop_type, dataset_type, st.session_state["ModelType"]
+        )
+    else:
+        model_path = prop_utils.get_model_path(
+            prop.prop_type, dataset_type, st.session_state["ModelType"]
+        )
 
-    if model_path.exists():
+    if model_path.is_dir():
+        l.download_button(
+            label=st_pages.decorate_options(prop_type_),
+            data=compact_model_as_zip(model_path, model_path.stat().st_mtime_ns),
+            file_name=f"{prop_type_}_model.zip",
+            use_container_width=True,
+            key=f"{i}_model_enabled",
+            type="primary",
+        )
+    elif model_path.exists():
         with open(model_path, "rb") as model_file:
             l.download_button(
                 label=st_pages.decorate_options(prop_type_),
@@ -62,18 +106,19 @@ for i, (prop_type_, prop) in enumerate(ALL_PROPERTY.items()):
         )
 
     # Download buttons for Dataset
-    dataset_path = prop_utils.get_dataset_path(prop.prop_type, dataset_type)
+    dataset_path = io.resolve_dataset_path(
+        prop_utils.get_dataset_path(prop.prop_type, dataset_type)
+    )
 
     if dataset_path.exists():
-        with open(dataset_path) as dataset_file:
-            r.download_button(
-                label=st_pages.decorate_options(prop_type_),
-                data=dataset_file,
-                file_name=f"{prop_type_}_dataset.csv",
-                use_container_width=True,
-                key=f"{i}_dataset_enabled",
-                type="primary",
-            )
+        r.download_button(
+            label=st_pages.decorate_options(prop_type_),
+            data=dataset_as_csv(dataset_path, dataset_path.stat().st_mtime_ns),
+            file_name=f"{prop_type_}_dataset.csv",
+            use_container_width=True,
+            key=f"{i}_dataset_enabled",
+            type="primary",
+        )
     else:
         r.button(
             label=st_pages.decorate_options(prop_type_),
@@ -10,3 +10,38 @@ TEN_LAC = 10_00_000
 CRORE = 1_00_00_000
 
 FACETS_PATH = Path("data/facets")
+# Score FEATURES and AMENITIES by the scores of their ids. Off, every listing scores
+# 0 as the stored datasets and the trained models do, turn on with a retrain.
+SCORE_FACET_IDS = False
+
+# --- --- Model Registry --- --- #
+MODEL_REGISTRY_MAXSIZE = 6
+MODEL_MMAP = True  # Serve the memory-mapped compact artifacts of the models
+SPARSE_OHE = False  # Train with sparse one-hot encoding, see `PricePredictor`
+CV_N_JOBS = -1  # Processes fitting the cross validation folds of `GetModelDetails`
+
+# --- --- Dataset Storage --- --- #
+DATASET_SUFFIX = ".parquet"
+MAX_PARTITIONS = 8  # Partitions of a dataset are merged in background above this
+
+# --- --- Streaming Ingestion --- --- #
+STREAMING_UPLOAD_BYTES = 50 * 1024 * 1024  # Stream the uploads larger than this
+INGEST_CHUNK_SIZE = 50_000
+
+# --- --- Feature Decoding --- --- #
+DECODE_THREADS = 4  # Threads running the independent decoders of `DecodeFeature`
+DECODE_PROCESSES = 1  # Processes running its GIL bound decoders, 0 to use threads
+DECODE_PARALLEL_MIN_ROWS = 50_000  # Smaller frames are decoded serially
+
+# --- --- Ingest Profiling --- --- #
+PROFILE_MEMORY = True  # Sample the peak memory of each stage of the cleaning
+PROFILE_LOG_PATH: Path | None = None  # Append the profile of every upload, as JSONL
+
+# --- --- Background Jobs --- --- #
+JOBS_PATH = Path("models/jobs")
+JOB_WORKERS = 2
+
+# --- --- Analytics Plots --- --- #
+SCATTER_MAX_POINTS = 5_000  # Larger scatters are sampled or binned on the server
+WEBGL_MIN_POINTS = 1_000  # Scatters with more points are rendered with WebGL
+HEXBIN_GRIDSIZE = 40  # No. of hexagons along the x-axis of the density plots
@@ -1,3 +1,6 @@
+import hashlib
+import json
+import os
 from pathlib import Path
 from typing import Any
 
@@ -5,6 +8,8 @@ import dill
 import pandas as pd
 import streamlit as st
 
+from src.core import storage
+from src.core.partitions import MANIFEST, PartitionedDataset
 from src.typing import stop as _stop
 
 
@@ -18,11 +23,143 @@ def read_csv(fp: Path, **kwargs) -> pd.DataFrame:
     return df
 
 
+def resolve_dataset_path(fp: Path) -> Path:
+    """Path the dataset at `fp` is stored at, its legacy `.csv` if not migrated yet."""
+    if not fp.exists() and (legacy_fp := fp.with_suffix(".csv")).exists():
+        return legacy_fp
+    return fp
+
+
+def dataset_exists(fp: Path) -> bool:
+    """Whether the dataset at `fp` exists, in the columnar or the legacy format."""
+    return resolve_dataset_path(fp).exists()
+
+
+def read_dataset(
+    fp: Path,
+    columns: list[str] | None = None,
+    filters: storage.Filters | None = None,
+) -> pd.DataFrame:
+    """
+    Read the dataset at `fp` with the storage backend of its suffix.
+
+    :columns: Only read these columns, the others are never parsed.
+    :filters: Only read the rows which satisfy all of these, e.g.
+        `[("PROP_ID", "==", prop_id)]`.
+    """
+    fp = resolve_dataset_path(fp)
+    if not fp.exists():
+        st.exception(FileNotFoundError(f"'{fp}' not exists."))
+        _stop()
+
+    if fp.is_dir():
+        return PartitionedDataset(fp).read(columns, filters)
+    return storage.get_backend(fp).read(fp, columns, filters)
+
+
+def dataset_columns(fp: Path) -> list[str]:
+    """Columns of the dataset at `fp`, without reading its rows."""
+    fp = resolve_dataset_path(fp)
+    if fp.is_dir():
+        return PartitionedDataset(fp).columns()
+    return storage.get_backend(fp).columns(fp)
+
+
+def write_dataset(df: pd.DataFrame, fp: Path) -> None:
+    """Write `df` at `fp` atomically with the storage backend of its suffix."""
+    if fp.is_dir():
+        return PartitionedDataset(fp).overwrite(df)
+
+    tmp_fp = fp.with_name(f".{fp.stem}.tmp{fp.suffix}")
+    storage.get_backend(fp).write(df, tmp_fp)
+    tmp_fp.replace(fp)
+
+
 def dill_load(fp: Path) -> Any:
     with fp.open("rb") as f:
         return dill.load(f)
 
 
 def dill_dump(obj: Any, fp: Path) -> Any:
-    with fp.open("wb") as f:
-        return dill.dump(obj, f)
+    """Dump `obj` atomically, readers never see a half-written `fp`."""
+    tmp_fp = fp.with_name(f".{fp.name}.{os.getpid()}.tmp")
+    try:
+        with tmp_fp.open("wb") as f:
+            rv = dill.dump(obj, f)
+        tmp_fp.replace(fp)
+    finally:
+        tmp_fp.unlink(missing_ok=True)
+    return rv
+
+
+def write_text(fp: Path, text: str) -> None:
+    """Write `text` atomically, readers never see a half-written `fp`."""
+    tmp_fp = fp.with_name(f".{fp.name}.{os.getpid()}.tmp")
+    try:
+        tmp_fp.write_text(text)
+        tmp_fp.replace(fp)
+    finally:
+        tmp_fp.unlink(missing_ok=True)
+
+
+_versions: dict[Path, tuple[int, str]] = {}
+
+
+def dataset_version(fp: Path) -> str:
+    """
+    Version token of the dataset at `fp`, i.e. its digest which is only recomputed
+    when the dataset changes. Cheap enough to be a cache key on every rerun.
+    """
+    fp = resolve_dataset_path(fp)
+    stat_fp = fp / MANIFEST if fp.is_dir() else fp
+    mtime_ns = stat_fp.stat().st_mtime_ns
+    if (cached := _versions.get(fp)) is None or cached[0] != mtime_ns:
+        _versions[fp] = cached = (mtime_ns, dataset_digest(fp))
+    return cached[1]
+
+
+def dataset_digest(fp: Path) -> str:
+    """Digest of the content of a dataset, which may be partitioned."""
+    fp = resolve_dataset_path(fp)
+    if fp.is_dir():
+        return file_digest(fp / MANIFEST)
+    return file_digest(fp)
+
+
+def file_digest(fp: Path, chunk_size: int = 1 << 20) -> str:
+    """Returns the `blake2b` hex digest of the content of `fp`."""
+    h = hashlib.blake2b(digest_size=16)
+    with fp.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _digest_path(fp: Path) -> Path:
+    return fp.with_name(f".{fp.name}.digest")
+
+
+def store_file_digest(fp: Path, digest: str) -> None:
+    """Record `digest` as the one of the current content of `fp`."""
+    stat = fp.stat()
+    record = {"digest": digest, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+    write_text(_digest_path(fp), json.dumps(record))
+
+
+def stored_file_digest(fp: Path) -> str:
+    """
+    `file_digest(fp)` recorded next to `fp`, it's computed again only when the
+    `mtime`/size of `fp` differ from the recorded ones. Cheap even for the large
+    models, and shared by every process of the host.
+    """
+    stat = fp.stat()
+    try:
+        record = json.loads(_digest_path(fp).read_text())
+        if (record["mtime_ns"], record["size"]) == (stat.st_mtime_ns, stat.st_size):
+            return record["digest"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        pass
+
+    digest = file_digest(fp)
+    store_file_digest(fp, digest)
+    return digest
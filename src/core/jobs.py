@@ -0,0 +1,261 @@
+"""
+Background jobs which run in their own process, so they don't block the streamlit
+script thread and can be cancelled at any time.
+
+Every job is persisted as `models/jobs/<job_id>.json`, which is updated by the
+job's process with its status and the timings of its stages.
+"""
+
+import json
+import multiprocessing as mp
+import os
+import signal
+import threading
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, Callable, Iterator, Literal, Self
+
+from pydantic import BaseModel, Field, NaiveDatetime
+
+from src.core import constants as C
+from src.utils._json_encoding import _json_default
+
+JobStatus = Literal["queued", "running", "done", "failed", "cancelled"]
+ACTIVE_STATUS: tuple[JobStatus, ...] = ("queued", "running")
+
+
+class StageTiming(BaseModel):
+    name: str
+    started_at: NaiveDatetime = Field(default_factory=datetime.now)
+    elapsed: float | None = None
+
+
+class ProcessRef(BaseModel):
+    """
+    A process by its pid and start time, so a pid reused by another process after
+    a restart is never mistaken for it.
+    """
+
+    pid: int
+    start_time: int | None = None  # Clock ticks after boot, `None` without `/proc`
+
+    @classmethod
+    def current(cls) -> Self:
+        return cls(pid=os.getpid(), start_time=_start_time(os.getpid()))
+
+    def is_running(self) -> bool:
+        """Whether the process still runs, `False` where it can't be verified."""
+        start_time = _start_time(self.pid)
+        return start_time is not None and start_time == self.start_time
+
+
+def _start_time(pid: int) -> int | None:
+    """Start time of the running process `pid` from `/proc`, `None` if it's gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The 2nd field is the command in parentheses, it may contain spaces
+            state, *fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    return None if state in ("Z", "X") else int(fields[18])
+
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex[:12])
+    kind: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    status: JobStatus = "queued"
+    created_at: NaiveDatetime = Field(default_factory=datetime.now)
+    started_at: NaiveDatetime | None = None
+    finished_at: NaiveDatetime | None = None
+    stages: list[StageTiming] = Field(default_factory=list)
+    error: str | None = None
+    owner: ProcessRef | None = None  # App process which queued it
+    process: ProcessRef | None = None  # Job process, leader of its own process group
+
+    @property
+    def is_active(self) -> bool:
+        return self.status in ACTIVE_STATUS
+
+    @staticmethod
+    def get_path(job_id: str) -> Path:
+        return C.JOBS_PATH / f"{job_id}.json"
+
+    @classmethod
+    def load(cls, job_id: str) -> Self:
+        return cls(**json.loads(cls.get_path(job_id).read_text()))
+
+    def save(self) -> None:
+        fp = self.get_path(self.id)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        tmp_fp = fp.with_name(f".{fp.name}.tmp")
+        tmp_fp.write_text(json.dumps(self.model_dump(), default=_json_default))
+        tmp_fp.replace(fp)
+
+
+class JobContext:
+    """Passed to the target of a job to record the timings of its stages."""
+
+    def __init__(self, job: Job) -> None:
+        self.job = job
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        timing = StageTiming(name=name)
+        self.job.stages.append(timing)
+        self.job.save()
+
+        yield
+
+        timing.elapsed = (datetime.now() - timing.started_at).total_seconds()
+        self.job.save()
+
+    def record(self, name: str, elapsed: float) -> None:
+        """Record a stage which is timed by the target itself."""
+        self.job.stages.append(StageTiming(name=name, elapsed=elapsed))
+        self.job.save()
+
+
+def _kill_job(pid: int) -> None:
+    """Terminate the job's process with the processes it started, e.g. a pool."""
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # No process groups, or the job's group isn't created yet
+        os.kill(pid, signal.SIGTERM)
+
+
+def _run_job(job_id: str, target: Callable[..., None], kwargs: dict) -> None:
+    """Entry point of the job's process."""
+    if hasattr(os, "setsid"):
+        os.setsid()
+
+    job = Job.load(job_id)
+    job.status, job.started_at = "running", datetime.now()
+    job.process = ProcessRef.current()
+    job.save()
+
+    try:
+        target(JobContext(job), **kwargs)
+        job.status = "done"
+    except Exception:
+        job.status, job.error = "failed", traceback.format_exc(limit=3)
+
+    job.finished_at = datetime.now()
+    job.save()
+
+
+class JobManager:
+    """
+    Runs the submitted jobs in spawned processes, at most `C.JOB_WORKERS` at once.
+
+    Jobs left active by a previous run of the app are marked as failed on first use,
+    unless their process is verified to be still running (needs `/proc`).
+    """
+
+    _instance = None
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super(JobManager, cls).__new__(cls)
+            cls._instance._init_manager(C.JOB_WORKERS)
+        return cls._instance
+
+    def _init_manager(self, max_workers: int) -> None:
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="job")
+        self._processes: dict[str, BaseProcess] = {}
+        self._lock = threading.Lock()
+        self._recovered = False
+
+    def _recover(self) -> None:
+        # Done lazily, as the module is imported by the job's process too
+        if self._recovered:
+            return
+        self._recovered = True
+        for job in self._load_jobs():
+            # A queued job is lost with its app, a running one with its own process
+            process = job.owner if job.status == "queued" else job.process
+            if job.is_active and (process is None or not process.is_running()):
+                job.status, job.error = "failed", "Interrupted by restart of the app."
+                job.save()
+
+    def submit(self, kind: str, target: Callable[..., None], **kwargs) -> Job:
+        """
+        Submit `target(ctx: JobContext, **kwargs)` as a job.
+
+        `target` must be a module level function and `kwargs` JSON serializable.
+        """
+        self._recover()
+        job = Job(kind=kind, params=kwargs, owner=ProcessRef.current())
+        job.save()
+        self._executor.submit(self._supervise, job.id, target, kwargs)
+        return job
+
+    def _supervise(self, job_id: str, target: Callable[..., None], kwargs: dict):
+        with self._lock:
+            if Job.load(job_id).status == "cancelled":
+                return
+            process = mp.get_context("spawn").Process(
+                target=_run_job, args=(job_id, target, kwargs)
+            )
+            process.start()
+            self._processes[job_id] = process
+
+        process.join()
+
+        with self._lock:
+            self._processes.pop(job_id, None)
+            job = Job.load(job_id)
+            if job.is_active:  # Process died without updating its job
+                job.status = "failed"
+                job.error = f"Job process exited with code {process.exitcode}."
+                job.finished_at = datetime.now()
+                job.save()
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a queued job or terminate a running one."""
+        with self._lock:
+            job = Job.load(job_id)
+            if (process := self._processes.get(job_id)) is not None:
+                if process.is_alive():
+                    _kill_job(process.pid)  # type: ignore[arg-type]
+                process.join(5)
+            elif job.status == "running":
+                # Started by a previous run of the app, killed only if it still runs
+                if job.process is None or not job.process.is_running():
+                    job.status, job.finished_at = "failed", datetime.now()
+                    job.error = "Job process is gone."
+                    job.save()
+                    return
+                _kill_job(job.process.pid)
+
+            job = Job.load(job_id)
+            if job.is_active:
+                job.status, job.finished_at = "cancelled", datetime.now()
+                job.save()
+
+    def jobs(self, kind: str | None = None, active_only: bool = False) -> list[Job]:
+        """All the jobs of `kind`, latest first."""
+        self._recover()
+        jobs = [
+            job
+            for job in self._load_jobs()
+            if (kind is None or job.kind == kind) and (job.is_active or not active_only)
+        ]
+        return sorted(jobs, key=lambda x: x.created_at, reverse=True)
+
+    @staticmethod
+    def _load_jobs() -> Iterator[Job]:
+        for fp in C.JOBS_PATH.glob("*.json"):
+            try:
+                yield Job(**json.loads(fp.read_text()))
+            except (FileNotFoundError, json.JSONDecodeError):
+                continue
+
+
+job_manager = JobManager()
@@ -0,0 +1,27 @@
+"""
+Locks shared by the processes of the host, i.e. the streamlit app and the background
+jobs, which write to the same files.
+"""
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None  # type: ignore[assignment]
+
+
+@contextmanager
+def file_lock(fp: Path) -> Iterator[None]:
+    """
+    Lock `fp` against the other processes for a read-modify-write. It's a no-op
+    where there is no `fcntl`.
+    """
+    lock_fp = fp.with_name(f".{fp.name}.lock")
+    lock_fp.parent.mkdir(parents=True, exist_ok=True)
+    with lock_fp.open("a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        yield
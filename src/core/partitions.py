@@ -0,0 +1,181 @@
+"""
+Append-only partitioned datasets.
+
+A partitioned dataset is a directory at the path of the dataset, e.g.
+`data/user/res_land.parquet/`, which holds:
+
+- `part-*.parquet`: One partition per append, only the new rows are written.
+- `_manifest.json`: The partitions to read, replaced atomically.
+- `_prop_ids.npy`: Index of the stored `PROP_ID`s, see `src.core.prop_index`.
+
+Appending N rows costs O(N) instead of rewriting the whole dataset. Once a dataset
+has more than `C.MAX_PARTITIONS` partitions they are merged in a background thread.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import pandas as pd
+
+from src.core import constants as C
+from src.core import storage
+from src.core.locks import file_lock
+from src.core.prop_index import PropIdIndex, hash_prop_ids
+
+MANIFEST = "_manifest.json"
+PROP_ID_INDEX = "_prop_ids.npy"
+
+_locks: dict[Path, threading.Lock] = {}
+_compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="compaction")
+
+
+def _get_lock(path: Path) -> threading.Lock:
+    return _locks.setdefault(path.resolve(), threading.Lock())
+
+
+class PartitionedDataset:
+    def __init__(self, path: Path, key: str = "PROP_ID") -> None:
+        """
+        :path: Path of the dataset, its suffix is the storage format of partitions.
+        :key: Column identifying a row, rows with stored keys are never appended.
+        """
+        self.path = path
+        self.key = key
+        self.backend = storage.get_backend(path)
+        self.lock = _get_lock(path)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """
+        Lock the dataset against the other threads and processes, e.g. a background
+        job appending to it while the app does.
+        """
+        with self.lock, file_lock(self.path):
+            yield
+
+    @property
+    def index_path(self) -> Path:
+        return self.path / PROP_ID_INDEX
+
+    def parts(self) -> list[Path]:
+        try:
+            manifest = json.loads((self.path / MANIFEST).read_text())
+        except FileNotFoundError:
+            return []
+        return [self.path / name for name in manifest["parts"]]
+
+    def _write_manifest(self, parts: list[Path]) -> None:
+        fp = self.path / MANIFEST
+        tmp_fp = fp.with_name(f".{fp.name}.tmp")
+        tmp_fp.write_text(json.dumps({"parts": [i.name for i in parts]}))
+        tmp_fp.replace(fp)
+
+    def _write_part(self, df: pd.DataFrame) -> Path:
+        fp = self.path / f"part-{time.time_ns()}-{os.getpid()}{self.backend.suffix}"
+        tmp_fp = fp.with_name(f".{fp.name}.tmp")
+        self.backend.write(df, tmp_fp)
+        tmp_fp.replace(fp)
+        return fp
+
+    def columns(self) -> list[str]:
+        return self.backend.columns(parts[0]) if (parts := self.parts()) else []
+
+    def read(
+        self,
+        columns: list[str] | None = None,
+        filters: storage.Filters | None = None,
+    ) -> pd.DataFrame:
+        """Read all the partitions, every partition is read with its own schema."""
+        for attempt in range(3):
+            try:
+                dfs = [self.backend.read(fp, columns, filters) for fp in self.parts()]
+                break
+            except FileNotFoundError:  # Partitions removed by a compaction
+                if attempt == 2:
+                    raise
+
+        if not dfs:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(dfs, axis="index", ignore_index=True)
+
+    def _migrate(self) -> None:
+        """Convert a dataset stored as a single file into a partitioned one."""
+        if not self.path.is_file():
+            self.path.mkdir(parents=True, exist_ok=True)
+            return
+
+        df = self.backend.read(self.path)
+        tmp_path = self.path.with_name(f".{self.path.name}.tmp")
+        self.path.replace(tmp_path)
+        self.path.mkdir()
+        self._write_manifest([self._write_part(df)])
+        PropIdIndex.build(df[self.key]).dump(self.index_path)
+        tmp_path.unlink()
+
+    def append(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append the rows of `df` whose key is not stored yet.
+
+        :return: The appended rows.
+        """
+        with self._locked():
+            self._migrate()
+            index = PropIdIndex.load(self.index_path, mmap=False)
+            df = df.drop_duplicates(subset=[self.key])
+            hashes = hash_prop_ids(df[self.key])
+            known = index.contains(hashes)
+            df, hashes = df[~known], hashes[~known]
+
+            if not df.empty:
+                # A crash between these writes leaves duplicates which are dropped
+                # by the next compaction, but never loses rows.
+                parts = self.parts() + [self._write_part(df)]
+                self._write_manifest(parts)
+                index.merge(hashes).dump(self.index_path)
+
+            if len(self.parts()) > C.MAX_PARTITIONS:
+                _compactor.submit(self.compact)
+        return df
+
+    def overwrite(self, df: pd.DataFrame) -> None:
+        """Replace all the partitions by `df`."""
+        with self._locked():
+            if self.path.is_file():
+                self.path.unlink()
+            self._migrate()
+            old_parts = self.parts()
+            df = df.drop_duplicates(subset=[self.key])
+            self._write_manifest([self._write_part(df)])
+            PropIdIndex.build(df[self.key]).dump(self.index_path)
+            self._remove(old_parts)
+
+    def compact(self) -> None:
+        """Merge all the partitions into one, appends are not blocked meanwhile."""
+        with self._locked():
+            parts = self.parts()
+        if len(parts) <= 1:
+            return
+
+        df = pd.concat(
+            [self.backend.read(fp) for fp in parts], axis="index", ignore_index=True
+        ).drop_duplicates(subset=[self.key])
+        merged = self._write_part(df)
+
+        with self._locked():
+            current = self.parts()
+            if not set(parts).issubset(current):  # Overwritten meanwhile
+                self._remove([merged])
+                return
+            self._write_manifest([merged] + [fp for fp in current if fp not in parts])
+        self._remove(parts)
+
+    @staticmethod
+    def _remove(parts: list[Path]) -> None:
+        for fp in parts:
+            fp.unlink(missing_ok=True)
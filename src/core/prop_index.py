@@ -0,0 +1,67 @@
+"""
+Persistent index of the `PROP_ID`s of a dataset, used to drop the already stored
+listings of an upload without reading the dataset.
+
+The index is a sorted `uint64` array of the hashes of the normalized `PROP_ID`s,
+stored as `.npy` file so it can be memory-mapped.
+"""
+
+from pathlib import Path
+from typing import Self
+
+import numpy as np
+import pandas as pd
+
+PROP_ID_PREFIX = "https://99acres.com/"
+
+
+def hash_prop_ids(prop_ids: pd.Series) -> np.ndarray:
+    """
+    Hashes of `prop_ids`, the datasets store them as `PROP_ID_PREFIX + id.upper()`
+    while the uploads hold the bare ids, both are hashed alike.
+    """
+    normalized = (
+        prop_ids.astype(str)
+        .str.strip()
+        .str.upper()
+        .str.removeprefix(PROP_ID_PREFIX.upper())
+    )
+    return pd.util.hash_array(normalized.to_numpy(dtype=object))
+
+
+class PropIdIndex:
+    __slots__ = ("hashes",)
+
+    def __init__(self, hashes: np.ndarray | None = None) -> None:
+        """:hashes: Sorted and unique hashes, see `hash_prop_ids()`."""
+        self.hashes = np.empty(0, np.uint64) if hashes is None else hashes
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @classmethod
+    def build(cls, prop_ids: pd.Series) -> Self:
+        return cls(np.unique(hash_prop_ids(prop_ids)))
+
+    def contains(self, hashes: np.ndarray) -> np.ndarray:
+        """Boolean mask of the `hashes` which are in the index."""
+        if not len(self.hashes):
+            return np.zeros(len(hashes), dtype=bool)
+        pos = np.searchsorted(self.hashes, hashes).clip(max=len(self.hashes) - 1)
+        return self.hashes[pos] == hashes
+
+    def merge(self, hashes: np.ndarray) -> Self:
+        return type(self)(np.union1d(self.hashes, hashes))
+
+    @classmethod
+    def load(cls, fp: Path, mmap: bool = True) -> Self:
+        """Load the index at `fp`, an empty index when it does not exist."""
+        try:
+            return cls(np.load(fp, mmap_mode="r" if mmap else None))
+        except FileNotFoundError:
+            return cls()
+
+    def dump(self, fp: Path) -> None:
+        tmp_fp = fp.with_name(f".{fp.stem}.tmp.npy")
+        np.save(tmp_fp, np.asarray(self.hashes))
+        tmp_fp.replace(fp)
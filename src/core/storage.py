@@ -0,0 +1,144 @@
+"""
+Storage backends used to persist the datasets under `data/`.
+
+The backend is picked from the suffix of the dataset path, so the rest of the
+project only deals with `io.read_dataset()`/`io.write_dataset()`.
+
+Migrate the existing `.csv` datasets with:
+
+```sh
+python -m src.core.storage data/main data/user
+```
+"""
+
+import operator
+import sys
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from src.core import constants as C
+
+# Row filters as `[(column, op, value), ...]`, the same as `pyarrow` filters
+Filters = list[tuple[str, str, Any]]
+
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "in": lambda s, v: s.isin(v),
+}
+
+
+def apply_filters(df: pd.DataFrame, filters: Filters) -> pd.DataFrame:
+    """Keep the rows of `df` which satisfy all the `filters`."""
+    for col, op, value in filters:
+        df = df[OPERATORS[op](df[col], value)]
+    return df
+
+
+class StorageBackend(ABC):
+    """Abstract class for the storage format of a dataset."""
+
+    suffix: str
+
+    @abstractmethod
+    def read(
+        self,
+        fp: Path,
+        columns: list[str] | None = None,
+        filters: Filters | None = None,
+    ) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def write(self, df: pd.DataFrame, fp: Path) -> None:
+        ...
+
+    @abstractmethod
+    def columns(self, fp: Path) -> list[str]:
+        ...
+
+
+class CsvBackend(StorageBackend):
+    suffix = ".csv"
+
+    def read(
+        self,
+        fp: Path,
+        columns: list[str] | None = None,
+        filters: Filters | None = None,
+    ) -> pd.DataFrame:
+        if not filters:
+            return pd.read_csv(fp, usecols=columns)
+
+        usecols = None if columns is None else [*columns, *(i[0] for i in filters)]
+        df = apply_filters(pd.read_csv(fp, usecols=usecols), filters)
+        return df if columns is None else df[columns]
+
+    def write(self, df: pd.DataFrame, fp: Path) -> None:
+        df.to_csv(fp, index=False)
+
+    def columns(self, fp: Path) -> list[str]:
+        return pd.read_csv(fp, nrows=0).columns.tolist()
+
+
+class ParquetBackend(StorageBackend):
+    """Typed columnar storage, only the requested columns are decoded on read."""
+
+    suffix = ".parquet"
+
+    def read(
+        self,
+        fp: Path,
+        columns: list[str] | None = None,
+        filters: Filters | None = None,
+    ) -> pd.DataFrame:
+        # Row groups are skipped by their statistics when filtered
+        return pd.read_parquet(fp, columns=columns, filters=filters or None)
+
+    def write(self, df: pd.DataFrame, fp: Path) -> None:
+        df.to_parquet(fp, index=False, compression="zstd")
+
+    def columns(self, fp: Path) -> list[str]:
+        return pq.read_schema(fp).names
+
+
+BACKENDS: dict[str, StorageBackend] = {
+    backend.suffix: backend for backend in (CsvBackend(), ParquetBackend())
+}
+
+
+def get_backend(fp: Path) -> StorageBackend:
+    try:
+        return BACKENDS[fp.suffix]
+    except KeyError:
+        raise ValueError(f"No storage backend for '{fp.suffix}' files.")
+
+
+def migrate(fp: Path, suffix: str = C.DATASET_SUFFIX, remove: bool = True) -> Path:
+    """Convert the dataset at `fp` into the storage format of `suffix`."""
+    dest = fp.with_suffix(suffix)
+    df = get_backend(fp).read(fp)
+    get_backend(dest).write(df, dest)
+
+    if remove:
+        fp.unlink()
+    return dest
+
+
+def migrate_dir(dir_path: Path, suffix: str = C.DATASET_SUFFIX) -> list[Path]:
+    """Convert every `.csv` dataset inside `dir_path` into the format of `suffix`."""
+    return [migrate(fp, suffix) for fp in sorted(dir_path.glob("*.csv"))]
+
+
+if __name__ == "__main__":
+    for dir_path in sys.argv[1:] or ["data/main", "data/user"]:
+        for fp in migrate_dir(Path(dir_path)):
+            print(f"Migrated '{fp}'.")
@@ -1,8 +1,15 @@
+import re
+from ast import literal_eval
+
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 
+from src.core import constants as C
+
 IMPORTANT_INIT_COLS = [
     "PROP_ID",
     "CITY",
@@ -131,6 +138,35 @@ LANDMARKS_GROUPS = {
     "HEALTH": ["hospital", "pharmacy"],
 }
 
+# Matches the `text` value of every landmark dict in FORMATTED_LANDMARK_DETAILS
+LANDMARK_TEXT_PATTERN = re.compile(
+    r"""['"]text['"]\s*:\s*(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)")"""
+)
+
+# Matches `'key': value` pairs of a flat dict literal, `{keys}` is filled by the keys
+DICT_FIELD_PATTERN = (
+    r"""['"](?P<key>{keys})['"]\s*:\s*"""
+    r"""(?:'(?P<sq>[^']*)'|"(?P<dq>[^"]*)"|(?P<raw>[^,}}]*))"""
+)
+DICT_RAW_VALUES = {"none": None, "null": None, "true": True, "false": False}
+
+# Quantities like "1.2 cr" or "1,250 sq.ft. (116.13 sq.m.)" for `decode_quantity()`,
+# and the keywords anywhere in a value which can't be decoded
+PRICE_PATTERN = r"^\s*(?P<value>\d[\d,]*(?:\.\d+)?)(?:\s+(?P<unit>cr|l))?"
+PRICE_REJECT_PATTERN = r"(?P<reject>bed|request|onwards|-)"
+AREA_PATTERN = (
+    r"^\s*(?P<value>\d[\d,]*(?:\.\d+)?)\s*(?P<unit>sq\.ft\.|sq\.m\.|sq\.yd\.)?"
+)
+AREA_REJECT_PATTERN = r"(?P<reject>-)"
+PRICE_UNITS = {"cr": C.CRORE, "l": C.LAKH}
+AREA_UNITS = {"sq.ft.": 1.0, "sq.m.": 10.7639, "sq.yd.": 9.0}
+REJECT_REASONS = {
+    "bed": "bedrooms",
+    "request": "on request",
+    "onwards": "onwards",
+    "-": "range",
+}
+
 COLS_TO_CLUSTER = [
     "TOTAL_LANDMARK_COUNT",
     "TRANSPORTATION",
@@ -144,27 +180,211 @@ COLS_TO_CLUSTER = [
 ]
 
 
-def lookup_mapping(x: list[str], lookup: dict[str, int]) -> float | int:
-    if isinstance(x, (float, int)):
-        return x
+def score_id_lists(s: pd.Series, scores: np.ndarray) -> pd.Series:
+    """
+    Sum the `scores` of the comma separated ids of each row, like "1,4,12".
+
+    The ids of all the rows are split and looked up at once, then summed by row with
+    `np.bincount()`. Unknown ids score 0 and missing rows stay missing.
+    """
+    strings = s if pd.api.types.is_object_dtype(s) else s.astype("string")
+    lists = pc.split_pattern(pa.array(strings, pa.string(), from_pandas=True), ",")
+    ids = pc.utf8_trim_whitespace(pc.list_flatten(lists))
+    ids = pc.if_else(pc.match_substring_regex(ids, r"^\d+(?:\.0*)?$"), ids, None)
+    ids = pc.cast(ids, pa.float64()).to_numpy(zero_copy_only=False)
+    ids = np.nan_to_num(ids, nan=-1).astype(np.int64)
+
+    known = (ids >= 0) & (ids < len(scores))
+    values = np.where(known, scores[np.where(known, ids, 0)], 0)
+    rows = pc.list_parent_indices(lists).to_numpy()
+    total = np.bincount(rows, weights=values, minlength=len(s))
+    return pd.Series(total, index=s.index).where(s.notna())
+
+
+def explode_landmark_texts(details: pd.Series) -> pd.DataFrame:
+    """
+    Parse FORMATTED_LANDMARK_DETAILS once into a flat `(row, text)` table, where `row`
+    is the position of the landmark's property in `details`.
+
+    The texts are extracted with a regex, only the rows containing escape sequences
+    are parsed with `literal_eval`.
+    """
+    rows: list[int] = []
+    texts: list[str] = []
+
+    for row, x in enumerate(details.fillna("[]").tolist()):
+        if "\\" in x:
+            row_texts = [i.get("text") for i in literal_eval(x)]
+            row_texts = [i for i in row_texts if isinstance(i, str)]
+        else:
+            row_texts = [sq or dq for sq, dq in LANDMARK_TEXT_PATTERN.findall(x)]
+
+        rows.extend([row] * len(row_texts))
+        texts.extend(row_texts)
+
+    return pd.DataFrame({"row": np.array(rows, dtype=np.int64), "text": texts})
+
+
+def score_landmark_groups(
+    details: pd.Series, landmarks_group: dict[str, list[str]]
+) -> pd.DataFrame:
+    """
+    Sum the landmark counts of each group of `landmarks_group` for every row.
+
+    A landmark text like `"3 hospitals"` adds its count to a group once for every
+    keyword of the group it contains.
+    """
+    flat = explode_landmark_texts(details)
+    codes, uniques = pd.factorize(flat["text"])
+
+    # Count the keyword matches of each unique text for every group
+    uniques_ = pd.Series(uniques, dtype=object)
+    matches = np.zeros((len(uniques_), len(landmarks_group)), dtype=int)
+    for i, keys in enumerate(landmarks_group.values()):
+        for j in keys:
+            matches[:, i] += uniques_.str.contains(j, regex=False).to_numpy(bool)
+
+    counts = pd.to_numeric(
+        uniques_.str.split(" ", n=1).str.get(0), errors="coerce"
+    ).fillna(0)
+    weights = matches * counts.to_numpy(int)[:, None]
+
+    rows = flat["row"].to_numpy()
+    return pd.DataFrame(
+        {
+            col: np.bincount(
+                rows, weights=weights[codes, i], minlength=len(details)
+            ).astype(int)
+            for i, col in enumerate(landmarks_group)
+        }
+    )
+
+
+def _parse_flat_dict(x: str, pattern: re.Pattern) -> dict | None:
+    """Regex parser of a flat dict literal, returns `None` when `x` is malformed."""
+    x = x.strip()
+    if not (x.startswith("{") and x.endswith("}")) or "\\" in x or x.count("{") != 1:
+        return None
+
+    record = {}
+    for m in pattern.finditer(x):
+        if m.lastgroup != "raw":
+            record[m["key"]] = m[m.lastgroup]
+            continue
+
+        raw = m["raw"].strip()
+        if raw.lower() in DICT_RAW_VALUES:
+            record[m["key"]] = DICT_RAW_VALUES[raw.lower()]
+            continue
+        try:
+            record[m["key"]] = float(raw) if "." in raw or "e" in raw else int(raw)
+        except ValueError:
+            return None
+    return record
+
+
+def parse_dict_fields(s: pd.Series, fields: list[str]) -> tuple[pd.DataFrame, int]:
+    """
+    Extract `fields` from a column of dict literals like `location` and `MAP_DETAILS`.
+
+    Rows are parsed with a regex, `literal_eval` is only used as a fallback for the
+    malformed rows. Fields of the rows which can't be parsed at all are `NaN`.
+
+    :return: Extracted fields aligned to `s` and the number of rows fell back.
+    """
+    pattern = re.compile(
+        DICT_FIELD_PATTERN.format(keys="|".join(map(re.escape, fields)))
+    )
+    records: list[dict] = []
+    n_fallback = 0
 
-    total_sum = sum(lookup.get(i, 0) for i in x)
-    return total_sum
+    for x in s.tolist():
+        if not isinstance(x, str):
+            records.append({})
+            continue
 
+        record = _parse_flat_dict(x, pattern)
+        if record is None:
+            n_fallback += 1
+            try:
+                record = literal_eval(x.replace("none", "None"))
+            except (ValueError, SyntaxError):
+                record = {}
+            record = record if isinstance(record, dict) else {}
+        records.append(record)
 
-def eval_numeric_values(x: str) -> str | float:
-    if pd.isna(x):
-        return np.nan
+    df = pd.DataFrame.from_records(records, columns=fields, index=s.index)
+    return df, n_fallback
 
-    x = x.replace(".", "")
-    if x.isnumeric():
-        return int(x)
-    return x
+
+def decode_quantity(
+    s: pd.Series,
+    pattern: str,
+    reject_pattern: str,
+    units: dict[str, float],
+    default_unit: float | None = None,
+) -> tuple[pd.Series, pd.Series]:
+    """
+    Decode quantities like "1.2 cr" with the groups `value` and `unit` of `pattern`,
+    the rows where the group `reject` of `reject_pattern` is found are rejected.
+
+    The regexes run in `pyarrow.compute.extract_regex()` (RE2), as `str.extract()`
+    runs them row by row in Python. Two anchored passes are cheaper than a single
+    pattern with a lazy `.*?` alternative for the keywords.
+
+    :units: Multiplier of each unit, the values without a unit are multiplied by
+        `default_unit` or rejected if it's `None`.
+    :return: Decoded values and the rejection reason of each row, `None` if kept.
+    """
+    arr = pa.array(s, pa.string(), from_pandas=True)
+    parts = pc.extract_regex(arr, pattern)
+
+    def group(parts: pa.StructArray, name: str) -> pa.Array:
+        """Values of the group, null where the row or the group didn't match."""
+        values = pc.struct_field(parts, name)
+        return pc.if_else(pc.equal(values, ""), None, values)
+
+    reject = pc.struct_field(pc.extract_regex(arr, reject_pattern), "reject")
+    reject = pd.Series(reject.to_pandas().to_numpy(), s.index)
+    values = pc.cast(pc.replace_substring(group(parts, "value"), ",", ""), pa.float64())
+    values = pd.Series(values.to_numpy(zero_copy_only=False), index=s.index)
+    unit = group(parts, "unit").to_pandas()
+    multiplier = pd.Series(unit.map(units).to_numpy(), s.index)
+    if default_unit is not None:
+        multiplier = multiplier.fillna(default_unit)
+
+    reasons = np.select(
+        [reject.notna(), s.isna(), values.isna(), multiplier.isna()],
+        [reject.map(REJECT_REASONS), "missing", "unparsed", "unit"],
+        default=None,
+    )
+    return (values * multiplier).round(2), pd.Series(reasons, index=s.index)
+
+
+def lowercase_str_values(df: pd.DataFrame) -> pd.DataFrame:
+    """Lowercase the string values of `df`, other values are kept as they are."""
+    df = df.copy()
+    for col in df.select_dtypes(include="object"):
+        try:
+            lowered = df[col].str.lower()
+        except AttributeError:  # Column doesn't contain any string value
+            continue
+        df[col] = lowered.where(lowered.notna(), df[col])
+    return df
 
 
 def create_LUXURY_CATEGORY(df: pd.DataFrame, n_clusters: int = 3) -> pd.Series:
+    """
+    Cluster the rows of `df`, a few rows left after skipping the stored listings
+    get at most one cluster per row. Values still missing, i.e. of the columns
+    without any value, count as 0.
+    """
+    if df.empty:
+        return pd.Series(dtype=int, name="LUXURY_CATEGORY")
+    n_clusters = min(n_clusters, len(df))
+
     scaler = StandardScaler()
-    data_ = scaler.fit_transform(df)
+    data_ = scaler.fit_transform(df.fillna(0))
 
     cluster = KMeans(
         n_clusters=n_clusters, init="k-means++", n_init=10, random_state=42
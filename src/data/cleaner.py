@@ -1,17 +1,32 @@
-from ast import literal_eval
 from functools import cached_property
 from pathlib import Path
+from typing import Any
 
 import pandas as pd
 from sklearn.linear_model import LinearRegression
 
-from src.core import io
+from src.core import constants as C
+from src.core.partitions import PartitionedDataset
+from src.property import listing_index
+from src.typing import DatasetType
 
 from . import _utils
 from ._utils import COLS_TO_ESTIMATE_AREA
 from .decode_feature import DecodeFeature
+from .profiling import Profiler, ProfileReport, StageProfile
 
-DUMP_DATASET_PATH = Path("data/user/user_data.csv")
+DUMP_DATASET_PATH = Path("data/user") / f"user_data{C.DATASET_SUFFIX}"
+
+
+def _mode(s: pd.Series) -> Any:
+    """Same as `s.mode()[0]`, `None` when `s` has no value, e.g. a few new rows."""
+    mode = s.mode()
+    return mode.iloc[0] if len(mode) else None
+
+
+def _mean(s: pd.Series) -> int | None:
+    mean = s.mean()
+    return None if pd.isna(mean) else round(mean)
 
 
 class AreaEstimator:
@@ -32,20 +47,23 @@ class AreaEstimator:
         ]["SUPER_SQFT"]
         self.df.loc[temp.index, "BUILTUP_SQFT"] = temp
 
-    def _train_model(self, X_cols: list[str]) -> LinearRegression:
+    def _train_model(self, X_cols: list[str]) -> LinearRegression | None:
+        """`None` when no row has both `X_cols` and BUILTUP_SQFT, e.g. few new rows."""
         dropped_df = self.df.dropna(subset=X_cols + ["BUILTUP_SQFT"], how="any")
+        if dropped_df.empty:
+            return None
         model = LinearRegression()
         model.fit(dropped_df[X_cols], dropped_df["BUILTUP_SQFT"])
         return model
 
     def _estimate_area(self, X_cols: list[str]) -> None:
-        model = self._train_model(X_cols)
-
         # Filter dataset to make prediction
         # --- --- --- --- HOW --- --- --- --- #
         # - BUILTUP_SQFT must be null.
         # - CARPET_SQFT/SUPERBUILTUP_SQFT must not be null.
         data_for_pred = self.df[self.df["BUILTUP_SQFT"].isnull()].dropna(subset=X_cols)
+        if data_for_pred.empty or (model := self._train_model(X_cols)) is None:
+            return
 
         # Calculate the area estimates and inplace them
         estimates = model.predict(data_for_pred[X_cols]).round(0).astype(int)
@@ -60,108 +78,217 @@ class AreaEstimator:
 
 
 class DataCleaner:
-    def __init__(self, df: pd.DataFrame) -> None:
+    def __init__(self, df: pd.DataFrame, skip_known: DatasetType | None = None) -> None:
+        """
+        :skip_known: Drop the listings already stored in the datasets of this type
+            before decoding, e.g. `"user"` when extending the user's datasets.
+        """
         self.__df = df
+        self.skip_known = skip_known
+        self.n_known = 0
+        self.parse_fallbacks: dict[str, int] = {}
+        self.rejections: dict[str, dict[str, int]] = {}
+        self.profiler = Profiler(C.PROFILE_MEMORY)
+
+    def _drop_known(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drop the listings of `df` which are stored in `skip_known` datasets."""
+        if self.skip_known is None or df.empty:
+            return df
+
+        known = listing_index.known(self.skip_known, df["PROP_ID"])
+        self.n_known += int(known.sum())
+        return df[~known]
+
+    def _parse_details(
+        self, df: pd.DataFrame, col: str, fields: dict[str, str]
+    ) -> pd.DataFrame:
+        """
+        Extract `fields` (`{key: new_col}`) of the dict literals of `col` into new
+        columns and record the number of rows which fell back to `literal_eval`.
+        """
+        parsed, n_fallback = _utils.parse_dict_fields(df[col], list(fields))
+        self.parse_fallbacks[col] = self.parse_fallbacks.get(col, 0) + n_fallback
+        df[list(fields.values())] = parsed.to_numpy()
+        return df
+
+    def _add_rejections(self, decoder: DecodeFeature) -> None:
+        """Accumulate the no. of rows rejected by `decoder`, by column and reason."""
+        for col, counts in decoder.rejections.items():
+            total = self.rejections.setdefault(col, {})
+            for reason, n in counts.items():
+                total[reason] = total.get(reason, 0) + n
+
+    def _add_decoder_timings(self, decoder: DecodeFeature) -> None:
+        """Record the timing of each decoder as a stage of the profile."""
+        for timing in decoder.timings:
+            self.profiler.add(
+                StageProfile(
+                    name=f"DecodeFeature.{timing.method}",
+                    wall_time=timing.wall_time,
+                    rows_in=timing.rows_in,
+                    rows_out=timing.rows_out,
+                )
+            )
+
+    @property
+    def profile(self) -> ProfileReport:
+        """Wall time, rows in and out and peak memory of each stage of `initiate()`."""
+        return self.profiler.report
+
+    def _drop_duplicates(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df.drop_duplicates(subset=["PROP_ID"])
 
     def _clean_df(self, df: pd.DataFrame) -> pd.DataFrame:
         """Returns a cleaned dataframe."""
         # Drop duplicated properties
-        df.drop_duplicates(subset=["PROP_ID"], inplace=True)
+        df = self._drop_duplicates(df)
 
         # Drop unnecessary prop types
         _ = ["studio apartment", "farm house", "serviced apartments", "other"]
         df = df.query("PROPERTY_TYPE != @_").reset_index(drop=True)
+        if df.empty:
+            return df
 
         # Extract features from `location` column
-        df["location"] = df["location"].str.replace("none", "None").apply(literal_eval)
-        df["LOCALITY_NAME"] = df["location"].str.get("locality_name")  # type: ignore
-        df["SOCIETY_NAME"] = df["location"].str.get("society_name")  # type: ignore
+        df = self._parse_details(
+            df,
+            "location",
+            {"locality_name": "LOCALITY_NAME", "society_name": "SOCIETY_NAME"},
+        )
 
         # Extract lat-long from MAP_DETAILS column
-        df["MAP_DETAILS"] = df["MAP_DETAILS"].apply(literal_eval)
-        df["LATITUDE"] = df["MAP_DETAILS"].str.get("latitude")  # type: ignore
-        df["LONGITUDE"] = df["MAP_DETAILS"].str.get("longitude")  # type: ignore
+        df = self._parse_details(
+            df, "MAP_DETAILS", {"latitude": "LATITUDE", "longitude": "LONGITUDE"}
+        )
+
+        df["LATITUDE"] = pd.to_numeric(df["LATITUDE"], errors="coerce")
+        df["LONGITUDE"] = pd.to_numeric(df["LONGITUDE"], errors="coerce")
 
         df["DESCRIPTION"] = df["DESCRIPTION"].str.replace("\n", " ")
 
         return df
 
     def dump_to_mongodb(self, df: pd.DataFrame) -> pd.DataFrame:
-        """For now just save the dataset into `data/user/` directory."""
-        if DUMP_DATASET_PATH.exists():
-            old_df = io.read_csv(DUMP_DATASET_PATH)
-            df = pd.concat([old_df, df], axis="index")
-            df.drop_duplicates(subset=["PROP_ID"], inplace=True)
-
-        df.to_csv(DUMP_DATASET_PATH, index=False)
+        """
+        For now just save the dataset into `data/user/` directory, only the listings
+        which are not stored yet are appended.
+        """
+        PartitionedDataset(DUMP_DATASET_PATH).append(df)
         return df
 
-    def _fillna(self, df: pd.DataFrame) -> pd.DataFrame:
-        df["TOTAL_LANDMARK_COUNT"].fillna(
-            round(df["TOTAL_LANDMARK_COUNT"].mean()), inplace=True
-        )
-        df["AMENITIES_SCORE"].fillna(round(df["AMENITIES_SCORE"].mean()), inplace=True)
-
+    @staticmethod
+    def _fillna_values(df: pd.DataFrame) -> dict[str, Any]:
+        """
+        Values to fill the missing values of each column with. `BALCONY_NUM` maps
+        `BEDROOM_NUM` to the median `BALCONY_NUM`.
+        """
         _ = ["residential land", "independent/builder floor"]
-        df["FURNISH"].fillna(
-            df.query("PROPERTY_TYPE != @_")["FURNISH"].mode()[0], inplace=True
+        bedroom_mode = _mode(df["BEDROOM_NUM"])
+        balcony_mapping = (
+            df.assign(BEDROOM_NUM=df["BEDROOM_NUM"].fillna(bedroom_mode))
+            .groupby("BEDROOM_NUM")["BALCONY_NUM"]
+            .median()
+            .dropna()
+            .to_dict()
         )
 
-        df["FACING"].fillna(df["FACING"].mode()[0], inplace=True)
-        df["AGE"].fillna(df["AGE"].mode()[0], inplace=True)
-        df["FLOOR_NUM"].fillna(df["FLOOR_NUM"].mode()[0], inplace=True)
-        df["BEDROOM_NUM"].fillna(df["BEDROOM_NUM"].mode()[0], inplace=True)
+        return {
+            "TOTAL_LANDMARK_COUNT": _mean(df["TOTAL_LANDMARK_COUNT"]),
+            "AMENITIES_SCORE": _mean(df["AMENITIES_SCORE"]),
+            "FURNISH": _mode(df.query("PROPERTY_TYPE != @_")["FURNISH"]),
+            "FACING": _mode(df["FACING"]),
+            "AGE": _mode(df["AGE"]),
+            "FLOOR_NUM": _mode(df["FLOOR_NUM"]),
+            "BEDROOM_NUM": bedroom_mode,
+            "BALCONY_NUM": balcony_mapping,
+        }
+
+    @staticmethod
+    def _apply_fillna(df: pd.DataFrame, values: dict[str, Any]) -> pd.DataFrame:
+        """The columns with a `None` value, i.e. without any value, aren't filled."""
+        df = df.fillna(
+            {k: v for k, v in values.items() if k != "BALCONY_NUM" and v is not None}
+        )
 
-        # BALCONY_NUM
         temp = df[df["BALCONY_NUM"].isnull()]
-        temp_mapping = df.pivot_table(
-            "BALCONY_NUM", "BEDROOM_NUM", aggfunc="median"
-        ).to_dict()["BALCONY_NUM"]
         df.loc[temp.index, "BALCONY_NUM"] = df.loc[temp.index, "BEDROOM_NUM"].map(
-            temp_mapping
+            values["BALCONY_NUM"]
         )
-
         return df
 
+    def _fillna(self, df: pd.DataFrame) -> pd.DataFrame:
+        return self._apply_fillna(df, self._fillna_values(df))
+
     @cached_property
     def is_v2_dataset(self) -> bool:
         return set(COLS_TO_ESTIMATE_AREA).issubset(self.__df.columns.tolist())
 
     def initiate(self) -> pd.DataFrame:
         """
-        `Load -> Decode & Clean -> Dump -> Return`
-        """
-        area_estimator = AreaEstimator(self.__df) if self.is_v2_dataset else None
+        `Load -> Skip known -> Decode & Clean -> Dump -> Return`
 
-        df = self.__df[_utils.IMPORTANT_INIT_COLS].map(
-            lambda x: x.lower() if isinstance(x, str) else x
-        )  # type: ignore
+        Every stage is profiled into `profile`, which is appended to
+        `C.PROFILE_LOG_PATH` if set.
+        """
+        try:
+            return self._initiate()
+        finally:
+            self.profiler.finish(C.PROFILE_LOG_PATH)
+
+    def _initiate(self) -> pd.DataFrame:
+        profiler = self.profiler
+        raw_df = profiler.call("_drop_known", self._drop_known, self.__df)
+        if raw_df.empty:
+            return pd.DataFrame(columns=_utils.REQUIRED_COLS)
+
+        area_estimator = AreaEstimator(raw_df) if self.is_v2_dataset else None
+
+        df = profiler.call(
+            "lowercase_str_values[IMPORTANT_INIT_COLS]",
+            _utils.lowercase_str_values,
+            raw_df[_utils.IMPORTANT_INIT_COLS],
+        )
         decoder = DecodeFeature(df)
 
-        if area_estimator is not None:
-            df = decoder.run_all("decode_AREA")
-            df["AREA"] = area_estimator.estimate()
-        else:
-            df = decoder.run_all()
+        with profiler.stage("DecodeFeature.run_all", len(df)) as stage:
+            if area_estimator is not None:
+                df = decoder.run_all("decode_AREA")
+            else:
+                df = decoder.run_all()
+            stage.rows_out = len(df)
+        self._add_decoder_timings(decoder)
+        self._add_rejections(decoder)
 
-        df = self._clean_df(df)
-        df = self._fillna(df)
+        if area_estimator is not None:
+            df["AREA"] = profiler.call(
+                "AreaEstimator.estimate", area_estimator.estimate
+            )
+
+        df = profiler.call("_clean_df", self._clean_df, df)
+        if df.empty:
+            return pd.DataFrame(columns=_utils.REQUIRED_COLS)
+        df = profiler.call("_fillna", self._fillna, df)
         df.reset_index(drop=True)
 
         # Cluster the `FEATURES` and `AMENITIES`
-        df["LUXURY_CATEGORY"] = _utils.create_LUXURY_CATEGORY(
-            df[_utils.COLS_TO_CLUSTER], n_clusters=3
+        df["LUXURY_CATEGORY"] = profiler.call(
+            "create_LUXURY_CATEGORY",
+            _utils.create_LUXURY_CATEGORY,
+            df[_utils.COLS_TO_CLUSTER],
+            n_clusters=3,
         )
 
         # Keep only required columns
-        df: pd.DataFrame = df[_utils.REQUIRED_COLS].map(
-            lambda x: x.lower() if isinstance(x, str) else x
-        )  # type: ignore
+        df = profiler.call(
+            "lowercase_str_values[REQUIRED_COLS]",
+            _utils.lowercase_str_values,
+            df[_utils.REQUIRED_COLS],
+        )
 
         # Check wether the all the required cols are present
         assert sorted(df.columns.tolist()) == sorted(
             _utils.REQUIRED_COLS
         ), "Required column not exists."
 
-        df = self.dump_to_mongodb(df)
+        df = profiler.call("dump_to_mongodb", self.dump_to_mongodb, df)
         return df
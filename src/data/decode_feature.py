@@ -1,20 +1,95 @@
 """
 Used to decoding the columns of dataset.
+
+Each decoder declares the columns it reads and writes with `@decoder`, so
+`DecodeFeature.run_all()` runs the independent ones at once on their own columns, in
+threads or in a process for the ones bound to the GIL.
 """
 
-from ast import literal_eval
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Literal
 
+import numpy as np
 import pandas as pd
+from pydantic import BaseModel
 
 from src.core import constants as C
-from src.core import io
 
-from . import _utils
+from . import _utils, facets
+
+Pool = Literal["serial", "thread", "process"]
+
+
+class Decoder(BaseModel):
+    inputs: list[str]
+    outputs: list[str]
+    gil_bound: bool = False
+
+
+class DecoderTiming(BaseModel):
+    method: str
+    pool: Pool
+    wall_time: float
+    rows_in: int
+    rows_out: int
+
+
+# Decoded columns, reason of each dropped row by column and timing of a decoder
+DecodedSlice = tuple[pd.DataFrame, dict[str, pd.Series], DecoderTiming]
+
+
+def decoder(
+    inputs: list[str], outputs: list[str] | None = None, gil_bound: bool = False
+) -> Callable:
+    """
+    Declare the columns read and written by a `decode_*` method.
+
+    :outputs: Columns written by the method, its `inputs` by default.
+    :gil_bound: The method runs Python code row by row, so run it in a process.
+    """
+
+    def wrap(method: Callable) -> Callable:
+        method.decoder = Decoder(
+            inputs=inputs, outputs=outputs or inputs, gil_bound=gil_bound
+        )
+        return method
+
+    return wrap
+
+
+_process_pool: ProcessPoolExecutor | None = None
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Pool kept for the life of the app, so its workers are spawned only once."""
+    global _process_pool
+    if _process_pool is None:
+        # `spawn` because the streamlit app forks with its threads running
+        _process_pool = ProcessPoolExecutor(
+            C.DECODE_PROCESSES, mp_context=mp.get_context("spawn")
+        )
+    return _process_pool
+
+
+def _reset_process_pool() -> None:
+    """Drop the broken pool, e.g. a worker died, the next use spawns a new one."""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
 
 
 class DecodeFeature:
     def __init__(self, df: pd.DataFrame) -> None:
         self.__df = df
+        # No. of rows dropped by each decoder, by the reason of rejection
+        self.rejections: dict[str, dict[str, int]] = {}
+        self._rejected: dict[str, pd.Series] = {}  # Reason of each dropped row
+        self.timings: list[DecoderTiming] = []
 
     @property
     def all_methods(self) -> list[str]:
@@ -29,142 +104,235 @@ class DecodeFeature:
 
     def run_all(self, *skip: str) -> pd.DataFrame:
         """
-        Run all the feature decoder method.
+        Run all the feature decoder method. The frames of `C.DECODE_PARALLEL_MIN_ROWS`
+        rows or more are decoded in parallel on machines with several cores, see
+        `_schedule()`, and their rejections are counted as if decoded serially.
 
         :skip (str): Specify the methods which you don't want to run.
         :hint: List all methods of class `DecodeFeature` using `.all_methods` property.
         """
-        [getattr(self, i)() for i in self.all_methods if i not in skip]
+        methods = [i for i in self.all_methods if i not in skip]
+        n_threads = min(C.DECODE_THREADS, os.cpu_count() or 1)
+        if n_threads <= 1 or len(self.__df) < C.DECODE_PARALLEL_MIN_ROWS:
+            [self._timed(i, "serial") for i in methods]
+            return self.__df
+
+        with ThreadPoolExecutor(n_threads, "decoder") as threads:
+            for wave in self._schedule(methods):
+                futures = {i: self._submit(i, threads) for i in wave}
+                self._merge({i: self._result(i, f) for i, f in futures.items()})
         return self.__df
 
-    def decode_PRICE(self) -> None:
-        self.__df["PRICE"] = self.__df["PRICE"].str.replace(",", "")
+    def _spec(self, method: str) -> Decoder:
+        """Declared columns of `method`, all the columns if it declares none."""
+        spec = getattr(getattr(self, method), "decoder", None)
+        if spec is None:
+            columns = self.__df.columns.tolist()
+            spec = Decoder(inputs=columns, outputs=columns)
+        return spec
 
-        # Drop properties with extraordinary prices like "price on request", "45l onwards"
-        self.__df.drop(
-            index=self.__df[
-                self.__df["PRICE"].str.contains("bed", regex=False)
-                | self.__df["PRICE"].str.contains("request", regex=False)
-                # TODO: Restore it due to its heavy presence.
-                | self.__df["PRICE"].str.contains("-", regex=False)
-                # TODO: Restore it due to easiness.
-                | self.__df["PRICE"].str.contains("onwards", regex=False)
-            ].index,
-            inplace=True,
+    def _schedule(self, methods: list[str]) -> list[list[str]]:
+        """
+        Group `methods` into waves which run one after another, the methods of a wave
+        run at once. A method runs after every method before it in `methods` which
+        writes a column it reads or writes, or reads a column it writes.
+        """
+        waves: list[list[str]] = []
+        wave_of: dict[str, int] = {}
+        for i, method in enumerate(methods):
+            spec, wave = self._spec(method), 0
+            for prev in methods[:i]:
+                prev_spec = self._spec(prev)
+                if set(prev_spec.outputs) & {*spec.inputs, *spec.outputs} or set(
+                    spec.outputs
+                ) & set(prev_spec.inputs):
+                    wave = max(wave, wave_of[prev] + 1)
+
+            wave_of[method] = wave
+            if wave == len(waves):
+                waves.append([])
+            waves[wave].append(method)
+        return waves
+
+    def _timed(self, method: str, pool: Pool) -> None:
+        rows_in, start = len(self.__df), time.perf_counter()
+        getattr(self, method)()
+        self.timings.append(
+            DecoderTiming(
+                method=method,
+                pool=pool,
+                wall_time=time.perf_counter() - start,
+                rows_in=rows_in,
+                rows_out=len(self.__df),
+            )
         )
 
-        def handle_price(x: str) -> str | float:
-            price = None
-            if " cr" in x:
-                price = round(float(x.split(" ")[0]) * C.CRORE, 2)
-            elif " l" in x:
-                price = round(float(x.split(" ")[0]) * C.LAKH, 2)
-            return price if price else x
+    def _slice(self, method: str) -> pd.DataFrame:
+        """Copy of the columns read by `method`, labelled by position."""
+        # Rows are labelled by position, so the results are merged by position
+        return self.__df[self._spec(method).inputs].set_axis(np.arange(len(self.__df)))
 
-        self.__df["PRICE"] = self.__df["PRICE"].apply(handle_price).astype(float)
-
-    def decode_AREA(self) -> None:
-        self.__df = self.__df.drop(
-            index=self.__df[
-                ~self.__df["AREA"].str.contains("sq.ft.", regex=False)
-            ].index
-        ).drop(index=self.__df[self.__df["AREA"].str.contains("-")].index)
-        self.__df["AREA"] = self.__df["AREA"].str.split(" ").str.get(0).astype(float)
+    def _submit(self, method: str, threads: ThreadPoolExecutor) -> Future:
+        """
+        Run `method` in a worker on a copy of the columns it reads. The GIL bound
+        ones run in a process only on machines with several cores.
+        """
+        df = self._slice(method)
+        use_process = C.DECODE_PROCESSES > 0 and (os.cpu_count() or 1) > 1
+        if self._spec(method).gil_bound and use_process:
+            try:
+                return _get_process_pool().submit(
+                    self._decode_slice, method, df, "process"
+                )
+            except BrokenProcessPool:
+                _reset_process_pool()
+        return threads.submit(self._decode_slice, method, df, "thread")
+
+    def _result(self, method: str, future: Future) -> DecodedSlice:
+        """
+        Result of `future`, or of `method` run serially when its process died, e.g.
+        the app's main module can't be imported by a spawned process.
+        """
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            _reset_process_pool()
+            return self._decode_slice(method, self._slice(method), "serial")
+
+    @classmethod
+    def _decode_slice(cls, method: str, df: pd.DataFrame, pool: Pool) -> DecodedSlice:
+        decoder = cls(df)
+        decoder._timed(method, pool)
+        outputs = decoder._spec(method).outputs
+        return decoder.__df[outputs], decoder._rejected, decoder.timings[0]
+
+    def _merge(
+        self,
+        results: dict[str, DecodedSlice],
+    ) -> None:
+        """
+        Keep the rows kept by every decoder, and set the columns they wrote.
 
-    def decode_FEATURES(self) -> None:
-        features_df = io.read_csv(C.FACETS_PATH / "FEATURES.csv")
-        features_df["values"] = features_df["label"].map(
-            _utils.FEATURES_MAPPING, "ignore"
+        `results` are in the order the decoders run serially, where a decoder never
+        sees the rows dropped by the ones before it. So only those rows rejected by
+        a decoder which are kept by all the decoders before it are counted.
+        """
+        keep = np.ones(len(self.__df), dtype=bool)
+        for df, rejected, _ in results.values():
+            for col, reasons in rejected.items():
+                reasons = reasons[keep[reasons.index.to_numpy()]]
+                self.rejections[col] = reasons.value_counts().to_dict()
+
+            kept = np.zeros(len(self.__df), dtype=bool)
+            kept[df.index.to_numpy()] = True
+            keep &= kept
+
+        positions = np.flatnonzero(keep)
+        if len(positions) < len(self.__df):
+            self.__df = self.__df.drop(index=self.__df.index[~keep])
+
+        for method, (df, _, timing) in results.items():
+            rows = np.searchsorted(df.index.to_numpy(), positions)
+            for col in df.columns:
+                self.__df[col] = df[col].to_numpy()[rows]
+            self.timings.append(timing)
+
+    def _drop_rejected(self, col: str, reasons: pd.Series) -> None:
+        rejected = reasons.notna()
+        self._rejected[col] = reasons[rejected]
+        self.rejections[col] = self._rejected[col].value_counts().to_dict()
+        self.__df = self.__df.drop(index=self.__df.index[rejected.to_numpy()])
+
+    @decoder(["PRICE"])
+    def decode_PRICE(self) -> None:
+        # Drop properties with extraordinary prices like "price on request", "45l onwards"
+        # TODO: Restore the ranges (heavy presence) and the onwards prices (easiness).
+        values, reasons = _utils.decode_quantity(
+            self.__df["PRICE"],
+            _utils.PRICE_PATTERN,
+            _utils.PRICE_REJECT_PATTERN,
+            _utils.PRICE_UNITS,
+            default_unit=1.0,
         )
+        self.__df["PRICE"] = values
+        self._drop_rejected("PRICE", reasons)
 
-        lookup_values = (
-            features_df[["id", "values"]].set_index("id").to_dict()["values"]
+    @decoder(["AREA"])
+    def decode_AREA(self) -> None:
+        # Drop the ranges of area and the areas in unknown units
+        values, reasons = _utils.decode_quantity(
+            self.__df["AREA"],
+            _utils.AREA_PATTERN,
+            _utils.AREA_REJECT_PATTERN,
+            _utils.AREA_UNITS,
         )
-        self.__df["FEATURES_SCORE"] = self.__df["FEATURES"].apply(
-            _utils.lookup_mapping, args=(lookup_values,)
+        self.__df["AREA"] = values
+        self._drop_rejected("AREA", reasons)
+
+    @decoder(["FEATURES"], ["FEATURES_SCORE"])
+    def decode_FEATURES(self) -> None:
+        self.__df["FEATURES_SCORE"] = facets.get("FEATURES").score(
+            self.__df["FEATURES"]
         )
 
+    @decoder(
+        ["FORMATTED_LANDMARK_DETAILS"], list(_utils.LANDMARKS_GROUPS), gil_bound=True
+    )
     def decode_FORMATTED_LANDMARK_DETAILS(self) -> None:
-        self.__df["FORMATTED_LANDMARK_DETAILS"] = (
-            self.__df["FORMATTED_LANDMARK_DETAILS"]
-            .fillna("[]")
-            .apply(literal_eval)
-            .apply(lambda x: [i.get("text") for i in x])
+        scores = _utils.score_landmark_groups(
+            self.__df["FORMATTED_LANDMARK_DETAILS"], _utils.LANDMARKS_GROUPS
         )
-
-        def handle_landmarks(
-            x: list[str], key: str, landmarks_group: dict[str, list[str]]
-        ) -> None:
-            rv: int = 0
-
-            for i in x:
-                for j in landmarks_group[key]:
-                    if j in i and isinstance(i, str):
-                        rv += int(i.split(" ")[0])
-
-            self.temp_data.append(rv)
-            self.__curr_idx += 1
-            return
-
         for col_name in _utils.LANDMARKS_GROUPS.keys():
-            self.__curr_idx = 0
-            self.temp_data = []
-
-            self.__df["FORMATTED_LANDMARK_DETAILS"].apply(
-                handle_landmarks, args=(col_name, _utils.LANDMARKS_GROUPS)
-            )
-            self.__df[col_name] = self.temp_data
+            self.__df[col_name] = scores[col_name].to_numpy()
 
+    @decoder(["BEDROOM_NUM"])
     def decode_BEDROOM_NUM(self) -> None:
-        self.__df["BEDROOM_NUM"] = self.__df["BEDROOM_NUM"].apply(
-            lambda x: x if x <= 5 else 99
+        # The missing values are 99 too
+        self.__df["BEDROOM_NUM"] = self.__df["BEDROOM_NUM"].where(
+            self.__df["BEDROOM_NUM"] <= 5, 99
         )
 
+    @decoder(["BALCONY_NUM"])
     def decode_BALCONY_NUM(self) -> None:
-        self.__df["BALCONY_NUM"] = self.__df["BALCONY_NUM"].apply(
-            lambda x: x if x <= 4 else 99
+        # The missing values are 99 too
+        self.__df["BALCONY_NUM"] = self.__df["BALCONY_NUM"].where(
+            self.__df["BALCONY_NUM"] <= 4, 99
         )
 
+    @decoder(["FLOOR_NUM"])
     def decode_FLOOR_NUM(self) -> None:
-        self.__df["FLOOR_NUM"] = self.__df["FLOOR_NUM"].apply(
-            _utils.eval_numeric_values
-        )
-        self.__df["FLOOR_NUM"] = self.__df["FLOOR_NUM"].apply(
-            lambda x: x
-            if pd.isna(x)
-            else "low rise"
-            if x in ["g", "l", "b", "m"]
-            else "low rise"
-            if 1 <= x <= 3
-            else "mid rise"
-            if 4 <= x <= 10
-            else "high rise"
-        )
-
+        # The dots are dropped, e.g. "3." is the 3rd floor. The floors "g", "l", "b"
+        # and "m" are low rise and the other non numeric floors high rise
+        floor = self.__df["FLOOR_NUM"]
+        text = floor.astype(str).str.replace(".", "", regex=False)
+        num = pd.to_numeric(text.where(text.str.isnumeric()), errors="coerce")
+        self.__df["FLOOR_NUM"] = pd.Series(
+            np.select(
+                [
+                    text.isin(["g", "l", "b", "m"]) | num.between(1, 3),
+                    num.between(4, 10),
+                ],
+                ["low rise", "mid rise"],
+                "high rise",
+            ),
+            index=floor.index,
+            dtype=object,
+        ).where(floor.notna())
+
+    @decoder(["AGE"])
     def decode_AGE(self) -> None:
-        age_df = io.read_csv(C.FACETS_PATH / "AGE.csv")
-        lookup_values = age_df.set_index("id").to_dict()["label"]
-        self.__df["AGE"] = self.__df["AGE"].map(lookup_values)
+        self.__df["AGE"] = facets.get("AGE").decode(self.__df["AGE"])
 
+    @decoder(["AMENITIES"], ["AMENITIES_SCORE"])
     def decode_AMENITIES(self) -> None:
-        self.__df["AMENITIES"] = self.__df["AMENITIES"].str.split(",")
-
-        amenity_df = io.read_csv(C.FACETS_PATH / "AMENITIES.csv")
-        amenity_df["values"] = amenity_df["label"].map(
-            _utils.AMENITIES_MAPPING, "ignore"
-        )
-
-        lookup_values = amenity_df[["id", "values"]].set_index("id").to_dict()["values"]
-        self.__df["AMENITIES_SCORE"] = self.__df["AMENITIES"].apply(
-            _utils.lookup_mapping, args=(lookup_values,)
+        self.__df["AMENITIES_SCORE"] = facets.get("AMENITIES").score(
+            self.__df["AMENITIES"]
         )
 
+    @decoder(["FURNISH"])
     def decode_FURNISH(self) -> None:
-        furnish_df = io.read_csv(C.FACETS_PATH / "FURNISH.csv")
-        lookup_values: dict[int, str] = furnish_df.set_index("id").to_dict()["label"]
-        self.__df["FURNISH"] = self.__df["FURNISH"].map(lookup_values)
+        self.__df["FURNISH"] = facets.get("FURNISH").decode(self.__df["FURNISH"])
 
+    @decoder(["FACING"])
     def decode_FACING(self) -> None:
-        facing_df = io.read_csv(C.FACETS_PATH / "FACING_DIRECTION.csv")
-        lookup_values: dict[int, str] = facing_df.set_index("id").to_dict()["label"]
-        self.__df["FACING"] = self.__df["FACING"].map(lookup_values)
+        self.__df["FACING"] = facets.get("FACING").decode(self.__df["FACING"])
@@ -0,0 +1,103 @@
+"""
+Registry of the facet tables in `data/facets`, which map the ids of the uploads to
+their labels and scores.
+
+Every table is read once per process into arrays indexed by the facet id, and read
+again only when its file changes. The decoders, the form options and the validators
+share the same tables, so no facet is read while serving a request.
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.core import constants as C
+from src.core import io
+
+from . import _utils
+
+# File of each facet in `C.FACETS_PATH`
+FACET_FILES = {
+    "AGE": "AGE.csv",
+    "AMENITIES": "AMENITIES.csv",
+    "FEATURES": "FEATURES.csv",
+    "FURNISH": "FURNISH.csv",
+    "FACING": "FACING_DIRECTION.csv",
+}
+
+# Score of the labels of the facets which are scored, the others score 0
+FACET_SCORES = {
+    "AMENITIES": _utils.AMENITIES_MAPPING,
+    "FEATURES": _utils.FEATURES_MAPPING,
+}
+
+
+class Facet:
+    __slots__ = ("name", "ids", "labels", "scores")
+
+    def __init__(self, name: str, table: pd.DataFrame) -> None:
+        """:table: Facet table with the integer `id` and `label` of each value."""
+        self.name = name
+        self.ids = table["id"].to_numpy(np.int64)
+        size = self.ids.max() + 1 if len(self.ids) else 0
+
+        # Ids missing from the table have no label and score 0
+        self.labels = np.full(size, np.nan, dtype=object)
+        self.labels[self.ids] = table["label"].to_numpy(object)
+        self.scores = np.zeros(size)
+        self.scores[self.ids] = (
+            table["label"].map(FACET_SCORES.get(name, {})).fillna(0).to_numpy()
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def options(self) -> list[str]:
+        """Lowercase labels in the order of the table, without the empty ones."""
+        labels = pd.Series(self.labels[self.ids]).dropna()
+        return labels.str.lower().tolist()
+
+    def _positions(self, s: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+        """Array position of the id of each row, and whether the id is known."""
+        ids = pd.to_numeric(s, errors="coerce").to_numpy(float)
+        known = np.isin(ids, self.ids)
+        return np.where(known, ids, 0).astype(np.int64), known
+
+    def is_known(self, s: pd.Series) -> pd.Series:
+        """Whether the value of each row is an id of the facet."""
+        return pd.Series(self._positions(s)[1], index=s.index)
+
+    def decode(self, s: pd.Series) -> pd.Series:
+        """Label of the id of each row, missing if the id is unknown."""
+        pos, known = self._positions(s)
+        return pd.Series(np.where(known, self.labels[pos], np.nan), index=s.index)
+
+    def score(self, s: pd.Series) -> pd.Series:
+        """
+        Sum of the scores of the comma separated ids of each row. Every row with ids
+        scores 0 unless `C.SCORE_FACET_IDS`, see there.
+        """
+        if not C.SCORE_FACET_IDS:
+            return pd.Series(0.0, index=s.index).where(s.notna())
+        return _utils.score_id_lists(s, self.scores)
+
+
+_cache: dict[str, tuple[int, Facet]] = {}
+
+
+def get(name: str) -> Facet:
+    """Facet `name` of `FACET_FILES`, read again only when its file changes."""
+    fp = C.FACETS_PATH / FACET_FILES[name]
+    try:
+        mtime_ns = fp.stat().st_mtime_ns
+    except FileNotFoundError:
+        mtime_ns = None
+
+    if (cached := _cache.get(name)) is None or cached[0] != mtime_ns:
+        # `io.read_csv()` reports the missing file to the user
+        _cache[name] = cached = (mtime_ns, Facet(name, io.read_csv(fp)))
+    return cached[1]
+
+
+def load_all() -> dict[str, Facet]:
+    return {name: get(name) for name in FACET_FILES}
@@ -0,0 +1,162 @@
+"""
+Per-stage profile of the cleaning of an upload, to find the stage responsible when an
+upload is slow and to track the ingest regressions over time.
+
+Every stage records its wall time, the rows it got and returned, and the peak of the
+resident memory of the process while it ran over the one when it started. The memory
+is sampled by a thread from `/proc/self/statm`, as `tracemalloc` slows the cleaning
+down a few times and misses the buffers of pyarrow. So it's not recorded where there
+is no `/proc`, and short peaks between two samples are missed.
+"""
+
+import json
+import mmap
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator, TypeVar
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel, Field, NaiveDatetime
+
+from src.utils._json_encoding import _json_default
+
+R = TypeVar("R")
+
+MEMORY_SAMPLE_INTERVAL = 0.005  # Seconds between two samples of the memory
+
+
+class StageProfile(BaseModel):
+    name: str
+    wall_time: float = 0.0
+    rows_in: int | None = None
+    rows_out: int | None = None
+    peak_memory_mb: float | None = None
+
+
+class ProfileReport(BaseModel):
+    started_at: NaiveDatetime = Field(default_factory=datetime.now)
+    wall_time: float = 0.0
+    stages: list[StageProfile] = Field(default_factory=list)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            [i.model_dump() for i in self.stages],
+            columns=list(StageProfile.model_fields),
+        )
+
+    def dump(self, fp: Path) -> None:
+        """Append the report to the JSON lines file `fp`."""
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        with fp.open("a") as f:
+            f.write(json.dumps(self.model_dump(), default=_json_default) + "\n")
+
+
+def _rss() -> int | None:
+    """Resident memory of the process in bytes, `None` where there is no `/proc`."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except OSError:
+        return None
+
+
+class _MemorySampler(threading.Thread):
+    """Samples the resident memory till stopped, keeping its peak."""
+
+    def __init__(self, start_rss: int) -> None:
+        super().__init__(name="memory-sampler", daemon=True)
+        self.peak = start_rss
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(MEMORY_SAMPLE_INTERVAL):
+            self.peak = max(self.peak, _rss() or 0)
+
+    def stop(self) -> int:
+        self._stopped.set()
+        self.join()
+        return max(self.peak, _rss() or 0)
+
+
+def _n_rows(x: Any) -> int | None:
+    return len(x) if isinstance(x, (pd.DataFrame, pd.Series, np.ndarray)) else None
+
+
+class Profiler:
+    def __init__(self, sample_memory: bool = True) -> None:
+        """:sample_memory: Record the peak memory of each stage."""
+        self.report = ProfileReport()
+        self.sample_memory = sample_memory
+        self._start: float | None = None
+
+    def _stage(self, name: str) -> StageProfile:
+        """Stage `name`, the stages run once per chunk of an upload are summed."""
+        for stage in self.report.stages:
+            if stage.name == name:
+                return stage
+        self.report.stages.append(stage := StageProfile(name=name))
+        return stage
+
+    @contextmanager
+    def stage(self, name: str, rows_in: int | None = None) -> Iterator[StageProfile]:
+        """
+        Profile the block as the stage `name`, its `rows_out` is set by the block.
+
+        ```python
+        with profiler.stage("_clean_df", len(df)) as stage:
+            df = self._clean_df(df)
+            stage.rows_out = len(df)
+        ```
+        """
+        stage = StageProfile(name=name, rows_in=rows_in)
+        if self._start is None:
+            self._start = time.perf_counter()
+        sampler = None
+        if self.sample_memory and (start_rss := _rss()) is not None:
+            sampler = _MemorySampler(start_rss)
+            sampler.start()
+
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.wall_time = time.perf_counter() - start
+            if sampler is not None:
+                stage.peak_memory_mb = (sampler.stop() - start_rss) / 2**20
+        self.add(stage)
+
+    def call(self, name: str, func: Callable[..., R], *args: Any, **kwargs: Any) -> R:
+        """
+        Profile `func(*args, **kwargs)` as the stage `name`, its rows are the ones of
+        the first argument and of the result.
+        """
+        with self.stage(name, _n_rows(args[0]) if args else None) as stage:
+            result = func(*args, **kwargs)
+            stage.rows_out = _n_rows(result)
+        return result
+
+    def add(self, stage: StageProfile) -> None:
+        """Record a stage which is profiled by the caller itself."""
+        total = self._stage(stage.name)
+        total.wall_time += stage.wall_time
+        for field in ("rows_in", "rows_out"):
+            if (value := getattr(stage, field)) is not None:
+                setattr(total, field, (getattr(total, field) or 0) + value)
+        if stage.peak_memory_mb is not None:
+            total.peak_memory_mb = max(total.peak_memory_mb or 0, stage.peak_memory_mb)
+
+    def finish(self, fp: Path | None = None) -> ProfileReport:
+        """
+        Total the wall time of the report.
+
+        :fp: Also append the report to this JSON lines file.
+        """
+        if self._start is not None:
+            self.report.wall_time = time.perf_counter() - self._start
+        if fp is not None:
+            self.report.dump(fp)
+        return self.report
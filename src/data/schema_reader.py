@@ -2,7 +2,7 @@ import json
 from typing import Self
 
 from src.core.constants import DATA_SCHEMA_PATH
-from src.typing import CAT_COLS_Key, PropertyAlias
+from src.typing import CAT_COLS_Key, EstimatorName, PropertyAlias
 
 
 class SchemaReader:
@@ -22,3 +22,4 @@ class SchemaReader:
         self.ALL_COLS: list[str] = schema_dict["all_cols"]
         self.NUM_COLS: list[str] = schema_dict["num_cols"]
         self.CAT_COLS: dict[CAT_COLS_Key, list[str]] = schema_dict["cat_cols"]
+        self.ESTIMATOR: EstimatorName = schema_dict.get("estimator", "random_forest")
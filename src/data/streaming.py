@@ -0,0 +1,316 @@
+"""
+Chunked, two-pass variant of `DataCleaner` for uploads too large to clean at once.
+
+- **Pass 1:** Decode and clean every chunk, spool it to disk and accumulate the global
+  statistics: fillna values, `AreaEstimator` inputs and `LUXURY_CATEGORY` features.
+- **Pass 2:** Fill, cluster and lowercase every spooled chunk, then append it to the
+  user's dataset and to the dataset of each property.
+"""
+
+import itertools
+import tempfile
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import pandas as pd
+
+from src.core import constants as C
+from src.data import _utils, validate
+from src.data._utils import COLS_TO_ESTIMATE_AREA
+from src.data.cleaner import AreaEstimator, DataCleaner
+from src.data.decode_feature import DecodeFeature
+from src.property.entity import ALL_PROPERTY
+from src.typing import DatasetType
+
+MEAN_COLS = ["TOTAL_LANDMARK_COUNT", "AMENITIES_SCORE"]
+MODE_COLS = ["FACING", "AGE", "FLOOR_NUM", "BEDROOM_NUM"]
+SPOOL_COLS = [i for i in _utils.REQUIRED_COLS if i != "LUXURY_CATEGORY"] + ["_ROW_ID"]
+
+
+def _add_counts(old: pd.Series | None, new: pd.Series) -> pd.Series:
+    return new if old is None else old.add(new, fill_value=0)
+
+
+def _mode_from_counts(counts: pd.Series) -> Any:
+    """Same as `pd.Series.mode()[0]` of the values counted in `counts`."""
+    if counts.empty:
+        return None
+    return counts[counts == counts.max()].sort_index().index[0]
+
+
+def _median_from_counts(counts: pd.Series) -> float:
+    """Same as `pd.Series.median()` of the values counted in `counts`."""
+    counts = counts.sort_index()
+    cum_counts = counts.cumsum().to_numpy()
+    n = cum_counts[-1]
+    lo = counts.index[np.searchsorted(cum_counts, (n - 1) // 2 + 1)]
+    hi = counts.index[np.searchsorted(cum_counts, n // 2 + 1)]
+    return (lo + hi) / 2
+
+
+class FillnaStats:
+    """Accumulates the values of `DataCleaner._fillna_values()` chunk by chunk."""
+
+    def __init__(self) -> None:
+        self._sums = {col: 0.0 for col in MEAN_COLS}
+        self._counts = {col: 0 for col in MEAN_COLS}
+        self._value_counts: dict[str, pd.Series] = {}
+
+    def _update_counts(self, key: str, counts: pd.Series) -> None:
+        self._value_counts[key] = _add_counts(self._value_counts.get(key), counts)
+
+    def update(self, df: pd.DataFrame) -> None:
+        for col in MEAN_COLS:
+            self._sums[col] += df[col].sum()
+            self._counts[col] += df[col].count()
+
+        _ = ["residential land", "independent/builder floor"]
+        self._update_counts(
+            "FURNISH", df.query("PROPERTY_TYPE != @_")["FURNISH"].value_counts()
+        )
+        for col in MODE_COLS:
+            self._update_counts(col, df[col].value_counts())
+
+        # BEDROOM_NUM is kept with NaN as it's filled before computing the medians
+        self._update_counts(
+            "BALCONY_NUM",
+            df.dropna(subset=["BALCONY_NUM"])
+            .groupby(["BEDROOM_NUM", "BALCONY_NUM"], dropna=False)
+            .size(),
+        )
+
+    def values(self) -> dict[str, Any]:
+        bedroom_mode = _mode_from_counts(self._value_counts["BEDROOM_NUM"])
+
+        balcony_counts = self._value_counts["BALCONY_NUM"].rename("n").reset_index()
+        balcony_counts["BEDROOM_NUM"] = balcony_counts["BEDROOM_NUM"].fillna(
+            bedroom_mode
+        )
+        balcony_mapping = {
+            bedroom: _median_from_counts(grp.groupby("BALCONY_NUM")["n"].sum())
+            for bedroom, grp in balcony_counts.groupby("BEDROOM_NUM")
+        }
+
+        return {
+            **{
+                col: round(self._sums[col] / self._counts[col])
+                if self._counts[col]
+                else None
+                for col in MEAN_COLS
+            },
+            "FURNISH": _mode_from_counts(self._value_counts["FURNISH"]),
+            **{col: _mode_from_counts(self._value_counts[col]) for col in MODE_COLS},
+            "BEDROOM_NUM": bedroom_mode,
+            "BALCONY_NUM": balcony_mapping,
+        }
+
+
+class IngestSummary:
+    """Insights about the cleaned data, accumulated chunk by chunk."""
+
+    def __init__(self) -> None:
+        self.n_rows = 0
+        self.columns: list[str] = []
+        self._groups: dict[str, pd.DataFrame] = {}
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.n_rows, len(self.columns)
+
+    def update(self, df: pd.DataFrame) -> None:
+        self.n_rows += len(df)
+        self.columns = df.columns.tolist()
+
+        for col in ("CITY", "PROPERTY_TYPE"):
+            agg = df.groupby(col).agg(
+                PROP_ID=("PROP_ID", "count"),
+                PRICE_sum=("PRICE", "sum"),
+                PRICE_count=("PRICE", "count"),
+                AREA_sum=("AREA", "sum"),
+                AREA_count=("AREA", "count"),
+            )
+            self._groups[col] = _add_counts(self._groups.get(col), agg)  # type: ignore
+
+    def nunique(self, col: str) -> int:
+        return len(self._groups.get(col, []))
+
+    def insights(self, col: str) -> pd.DataFrame:
+        """
+        No. of properties, mean PRICE and mean AREA of each value of `col`. The means
+        are truncated like `astype(int)`, and missing when a group has no value.
+        """
+        grp = self._groups[col]
+        df = pd.DataFrame(
+            {
+                "PROP_ID": grp["PROP_ID"],
+                "PRICE": grp["PRICE_sum"] / grp["PRICE_count"],
+                "AREA": grp["AREA_sum"] / grp["AREA_count"],
+            }
+        )
+        return np.trunc(df).astype("Int64").sort_values("PROP_ID", ascending=False)
+
+
+class StreamingDataCleaner(DataCleaner):
+    """
+    Clean the upload chunk by chunk, the output is the same as of `DataCleaner`.
+
+    Only the `AreaEstimator` inputs and the `LUXURY_CATEGORY` features of every row
+    are kept in memory till the end of pass 1, all other data is on disk.
+    """
+
+    def __init__(
+        self, chunks: Iterable[pd.DataFrame], skip_known: DatasetType | None = None
+    ) -> None:
+        chunks = iter(chunks)
+        first_chunk = next(chunks)
+        super().__init__(first_chunk, skip_known)
+
+        self._chunks: Iterator[pd.DataFrame] = itertools.chain([first_chunk], chunks)
+        self._seen_ids: set[str] = set()
+        self.fillna_stats = FillnaStats()
+        self.summary = IngestSummary()
+
+    def _drop_duplicates(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Drop the properties duplicated within the chunk or with earlier chunks."""
+        df = super()._drop_duplicates(df)
+        df = df[~df["PROP_ID"].isin(self._seen_ids)]
+        self._seen_ids.update(df["PROP_ID"])
+        return df
+
+    def _first_pass(
+        self, spool_dir: Path
+    ) -> tuple[pd.Series | None, np.ndarray] | None:
+        """
+        Decode, clean and spool every chunk.
+
+        :return: Estimated AREA of each row of upload (for v2 datasets) and the
+            LUXURY_CATEGORY of each cleaned row, `None` when no row is left.
+        """
+        profiler = self.profiler
+        area_parts: list[pd.DataFrame] = []
+        cluster_parts: list[pd.DataFrame] = []
+        offset = 0
+
+        for i, chunk in enumerate(self._chunks):
+            validate.validate_dataset(chunk)
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+
+            chunk = profiler.call("_drop_known", self._drop_known, chunk)
+            if chunk.empty:
+                continue
+
+            if self.is_v2_dataset:
+                area_parts.append(chunk[COLS_TO_ESTIMATE_AREA])
+
+            df = profiler.call(
+                "lowercase_str_values[IMPORTANT_INIT_COLS]",
+                _utils.lowercase_str_values,
+                chunk[_utils.IMPORTANT_INIT_COLS],
+            )
+            decoder = DecodeFeature(df)
+            with profiler.stage("DecodeFeature.run_all", len(df)) as stage:
+                df = (
+                    decoder.run_all("decode_AREA")
+                    if self.is_v2_dataset
+                    else decoder.run_all()
+                )
+                stage.rows_out = len(df)
+            self._add_decoder_timings(decoder)
+            self._add_rejections(decoder)
+            df["_ROW_ID"] = df.index
+
+            df = profiler.call("_clean_df", self._clean_df, df)
+            if df.empty:
+                continue
+            self.fillna_stats.update(df)
+            cluster_parts.append(df[_utils.COLS_TO_CLUSTER])
+            df[SPOOL_COLS].to_pickle(spool_dir / f"{i:05d}.pkl")
+
+        if not cluster_parts:
+            return None
+
+        fillna_values = self.fillna_stats.values()
+        cluster_df = pd.concat(cluster_parts, ignore_index=True).fillna(
+            {
+                col: fillna_values[col]
+                for col in MEAN_COLS
+                if fillna_values[col] is not None
+            }
+        )
+        luxury_category = profiler.call(
+            "create_LUXURY_CATEGORY",
+            _utils.create_LUXURY_CATEGORY,
+            cluster_df,
+            n_clusters=3,
+        )
+
+        area = None
+        if area_parts:
+            estimator = AreaEstimator(pd.concat(area_parts))
+            area = profiler.call("AreaEstimator.estimate", estimator.estimate)
+        return area, luxury_category.to_numpy()
+
+    def _second_pass(
+        self, spool_dir: Path, area: pd.Series | None, luxury_category: np.ndarray
+    ) -> Iterator[pd.DataFrame]:
+        """Yield every spooled chunk filled, clustered and with required columns."""
+        fillna_values = self.fillna_stats.values()
+        offset = 0
+
+        for fp in sorted(spool_dir.glob("*.pkl")):
+            df = pd.read_pickle(fp)
+            if area is not None:
+                df["AREA"] = area.loc[df["_ROW_ID"]].to_numpy()
+
+            df = self.profiler.call("_fillna", self._apply_fillna, df, fillna_values)
+            end = offset + len(df)
+            df["LUXURY_CATEGORY"] = luxury_category[offset:end]
+            offset = end
+
+            yield self.profiler.call(
+                "lowercase_str_values[REQUIRED_COLS]",
+                _utils.lowercase_str_values,
+                df[_utils.REQUIRED_COLS],
+            )
+
+    def initiate(  # type: ignore[override]
+        self, dataset_type: DatasetType = "user", extend: bool = True
+    ) -> IngestSummary:
+        """
+        `Load -> Decode & Clean -> Spool -> Fill & Cluster -> Dump`
+
+        Unlike `DataCleaner.initiate()` the cleaned data is also dumped into the
+        datasets of each property, as it is never held in memory at once. The stages
+        run for every chunk are summed in `profile`.
+        """
+        try:
+            return self._initiate(dataset_type, extend)
+        finally:
+            self.profiler.finish(C.PROFILE_LOG_PATH)
+
+    def _initiate(  # type: ignore[override]
+        self, dataset_type: DatasetType, extend: bool
+    ) -> IngestSummary:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            spool_dir = Path(tmp_dir, "spool")
+            spool_dir.mkdir()
+
+            if (first_pass := self._first_pass(spool_dir)) is None:
+                return self.summary
+
+            # Every chunk is dumped as soon as it's cleaned, only the first one may
+            # overwrite the stored datasets
+            for i, df in enumerate(self._second_pass(spool_dir, *first_pass)):
+                self.summary.update(df)
+                self.profiler.call("dump_to_mongodb", self.dump_to_mongodb, df)
+                with self.profiler.stage("dump_dataframe", len(df)):
+                    for prop in ALL_PROPERTY.values():
+                        prop.dump_dataframe(
+                            prop.extract_this_property(df),
+                            dataset_type,
+                            extend or i > 0,
+                        )
+
+        return self.summary
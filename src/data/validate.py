@@ -1,15 +1,24 @@
 import pandas as pd
 
 from src.core.errors import DataValidationError
-from src.data import _utils
+from src.data import _utils, facets
 
 
 def validate_dataset(df: pd.DataFrame):
-    if sorted(df.columns.tolist()) == sorted(_utils.IMPORTANT_INIT_COLS):
+    if missing_cols := set(_utils.IMPORTANT_INIT_COLS) - set(df.columns.tolist()):
         raise DataValidationError(
             "Dataset must have the important initial columns. "
-            f"Column: {set(df.columns.tolist()) & set(_utils.IMPORTANT_INIT_COLS)} not present."
+            f"Column: {missing_cols} not present."
         )
 
     if df["PRICE"].isnull().sum() != 0:
         raise DataValidationError("PRICE column contains null values.")
+
+    # Facet columns hold the ids of the facet, not their labels
+    for col in ("FURNISH", "FACING", "AGE"):
+        facet, values = facets.get(col), df[col].dropna()
+        if len(values) and not facet.is_known(values).any():
+            raise DataValidationError(
+                f"{col} column must contain the ids of the facet, "
+                f"e.g. {facet.ids[:3].tolist()}, not their labels."
+            )
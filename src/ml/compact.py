@@ -0,0 +1,374 @@
+"""
+Compact artifact format of the price predictor models.
+
+The `.dill` pipelines hold the `RandomForestRegressor` as python objects, which are
+large on disk and slow to unpickle. A compact artifact is a directory next to the
+`.dill` file which stores the preprocessing steps as a small `transform.dill` and the
+trees of the forest as flat NumPy arrays (`.npy`), so they can be memory-mapped.
+
+```sh
+python -m src.ml.compact --dataset-type main --max-depth 20 --float32
+```
+"""
+
+import argparse
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Self
+
+import numpy as np
+import pandas as pd
+from pydantic import BaseModel
+from scipy import sparse
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+
+from src.core import io
+from src.property import _utils as prop_utils
+from src.typing import DatasetType, ModelType, PropertyAlias
+
+ARRAYS = ("feature", "threshold", "children_left", "children_right", "value", "roots")
+TREE_LEAF = -1
+# Number of (tree, row) paths traversed at once while predicting
+PREDICT_CHUNK_NODES = 2**21
+
+
+def _cap_tree(tree, max_depth: int | None) -> tuple[np.ndarray, ...]:
+    """
+    Nodes of `tree` (a fitted `sklearn.tree._tree.Tree`), the nodes at `max_depth`
+    become leaves which predict the mean target of their samples.
+    """
+    left, right = tree.children_left, tree.children_right
+    if max_depth is None or tree.max_depth <= max_depth:
+        nodes = np.arange(tree.node_count)  # Nothing to prune
+    else:
+        order, depth = [0], {0: 0}
+        for node in order:  # `order` grows while iterating
+            if left[node] != TREE_LEAF and depth[node] < max_depth:
+                for child in (left[node], right[node]):
+                    depth[child] = depth[node] + 1
+                    order.append(child)
+        nodes = np.array(order)
+
+    new_id = np.full(tree.node_count, TREE_LEAF, dtype=np.int64)
+    new_id[nodes] = np.arange(len(nodes))
+
+    children_left = new_id[left[nodes]]
+    children_right = new_id[right[nodes]]
+    is_leaf = (left[nodes] == TREE_LEAF) | (children_left == TREE_LEAF)
+    children_left[is_leaf] = children_right[is_leaf] = TREE_LEAF
+    feature = np.where(is_leaf, 0, tree.feature[nodes])
+
+    return (
+        feature,
+        tree.threshold[nodes],
+        children_left,
+        children_right,
+        tree.value[nodes].reshape(len(nodes)),
+    )
+
+
+class CompactForest:
+    """
+    Trees of a fitted `RandomForestRegressor` packed into flat arrays.
+
+    Children ids are global, so the paths of all the trees are advanced together.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], max_depth: int) -> None:
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+        self.max_depth = max_depth
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.feature)
+
+    @classmethod
+    def from_estimator(
+        cls,
+        estimator: RandomForestRegressor,
+        *,
+        max_depth: int | None = None,
+        n_estimators: int | None = None,
+        float32: bool = False,
+    ) -> Self:
+        """
+        :max_depth: Prune the trees deeper than `max_depth`.
+        :n_estimators: Keep only the first `n_estimators` trees.
+        :float32: Store the thresholds and the leaf values as `float32`.
+        """
+        trees = [
+            _cap_tree(i.tree_, max_depth) for i in estimator.estimators_[:n_estimators]
+        ]
+        offsets = np.cumsum([0] + [len(i[0]) for i in trees])
+
+        feature, threshold, left, right, value = (
+            np.concatenate([t[i] for t in trees]) for i in range(5)
+        )
+        is_leaf = left == TREE_LEAF
+        node_offsets = np.repeat(offsets[:-1], np.diff(offsets))
+        left = np.where(is_leaf, TREE_LEAF, left + node_offsets)
+        right = np.where(is_leaf, TREE_LEAF, right + node_offsets)
+
+        if float32:
+            # `X` is compared as `float32` by sklearn, so the largest `float32` not
+            # greater than the threshold keeps the same split of every sample.
+            threshold_32 = threshold.astype(np.float32)
+            too_big = threshold_32 > threshold
+            threshold_32[too_big] = np.nextafter(
+                threshold_32[too_big], np.float32(-np.inf)
+            )
+            threshold, value = threshold_32, value.astype(np.float32)
+
+        arrays = {
+            "feature": feature.astype(np.int32),
+            "threshold": threshold,
+            "children_left": left.astype(np.int32),
+            "children_right": right.astype(np.int32),
+            "value": value,
+            "roots": offsets[:-1].astype(np.int32),
+        }
+        depth = max(i.tree_.max_depth for i in estimator.estimators_[:n_estimators])
+        return cls(arrays, min(depth, max_depth or depth))
+
+    def predict(self, X: np.ndarray | sparse.spmatrix) -> np.ndarray:
+        """Mean prediction of all the trees, like `RandomForestRegressor.predict()`."""
+        if sparse.issparse(X):
+            X = sparse.csr_array(X)  # Densified chunk by chunk
+        else:
+            X = np.asarray(X, dtype=np.float32)
+
+        n_trees = len(self.roots)
+        chunk_size = max(1, PREDICT_CHUNK_NODES // n_trees)
+        return np.concatenate(
+            [
+                self._predict_chunk(X[slice(start, start + chunk_size)], n_trees)
+                for start in range(0, X.shape[0], chunk_size)
+            ]
+            or [np.empty(0)]
+        )
+
+    def _predict_chunk(self, X, n_trees: int) -> np.ndarray:
+        if sparse.issparse(X):
+            X = X.toarray()
+        n_rows, n_features = X.shape
+        x = X.astype(np.float32, copy=False).ravel()
+
+        # One (tree, row) path per item, tree major so the nodes of a tree are
+        # visited together. Only the paths which are not at a leaf are advanced.
+        node = np.repeat(self.roots.astype(np.int64), n_rows)
+        offset = np.tile(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        active = np.arange(len(node))
+        while active.size:
+            nd = node[active]
+            left = self.children_left[nd]
+            is_split = left != TREE_LEAF
+            active, nd, left = active[is_split], nd[is_split], left[is_split]
+
+            go_left = x[offset[active] + self.feature[nd]] <= self.threshold[nd]
+            node[active] = np.where(go_left, left, self.children_right[nd])
+
+        return self.value[node].reshape(n_trees, n_rows).mean(axis=0, dtype=np.float64)
+
+    def save(self, dir_path: Path) -> None:
+        dir_path.mkdir(parents=True, exist_ok=True)
+        for name in ARRAYS:
+            np.save(dir_path / f"{name}.npy", getattr(self, name))
+
+    @classmethod
+    def load(cls, dir_path: Path, max_depth: int, mmap: bool = True) -> Self:
+        """:mmap: Memory-map the arrays instead of reading them into memory."""
+        mmap_mode = "r" if mmap else None
+        arrays = {
+            name: np.load(dir_path / f"{name}.npy", mmap_mode=mmap_mode)
+            for name in ARRAYS
+        }
+        return cls(arrays, max_depth)
+
+
+class CompactModel:
+    """Drop-in replacement of the `Pipeline`, only `predict()` is supported."""
+
+    def __init__(self, transform: Pipeline, forest: CompactForest) -> None:
+        self.transform = transform
+        self.forest = forest
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        return self.forest.predict(self.transform.transform(X))
+
+
+def export(
+    pipeline: Pipeline,
+    dir_path: Path,
+    *,
+    max_depth: int | None = None,
+    n_estimators: int | None = None,
+    float32: bool = False,
+    source_digest: str | None = None,
+) -> CompactModel:
+    """
+    Store `pipeline` (ending with a `RandomForestRegressor`) as compact artifact.
+
+    :source_digest: Digest of the `.dill` file of `pipeline`, see `is_current()`.
+    """
+    forest = CompactForest.from_estimator(
+        pipeline[-1], max_depth=max_depth, n_estimators=n_estimators, float32=float32
+    )
+
+    # Write into a temporary directory and swap it, a served artifact stays usable
+    tmp_path = dir_path.with_name(f".{dir_path.name}.{os.getpid()}.tmp")
+    forest.save(tmp_path)
+    io.dill_dump(pipeline[:-1], tmp_path / "transform.dill")
+    meta = {
+        "max_depth": forest.max_depth,
+        "n_estimators": len(forest.roots),
+        "n_nodes": forest.n_nodes,
+        "float32": float32,
+        "source_digest": source_digest,
+    }
+    (tmp_path / "meta.json").write_text(json.dumps(meta, indent=2))
+
+    old_path = dir_path.with_name(f".{dir_path.name}.{os.getpid()}.old")
+    if dir_path.exists():
+        dir_path.replace(old_path)
+    tmp_path.replace(dir_path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    return CompactModel(pipeline[:-1], forest)
+
+
+def load(dir_path: Path, mmap: bool = True) -> CompactModel:
+    """
+    Load a compact artifact.
+
+    :raise FileNotFoundError: When the artifact is not exported yet.
+    """
+    meta = json.loads((dir_path / "meta.json").read_text())
+    return CompactModel(
+        io.dill_load(dir_path / "transform.dill"),
+        CompactForest.load(dir_path, meta["max_depth"], mmap),
+    )
+
+
+def is_current(dir_path: Path, source_digest: str) -> bool:
+    """Whether the artifact at `dir_path` is exported from the `.dill` file."""
+    try:
+        meta = json.loads((dir_path / "meta.json").read_text())
+    except FileNotFoundError:
+        return False
+    return meta.get("source_digest") == source_digest
+
+
+def dir_size(dir_path: Path) -> int:
+    return sum(fp.stat().st_size for fp in dir_path.glob("*"))
+
+
+class CompactReport(BaseModel):
+    prop_type: PropertyAlias
+    dataset_type: DatasetType
+    n_nodes: int
+    dill_size: int
+    compact_size: int
+    dill_load_time: float
+    compact_load_time: float
+    max_abs_delta: float
+    max_rel_delta: float
+    mean_rel_delta: float
+
+
+def export_model(
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    model_type: ModelType = "price_predictor",
+    **kwargs,
+) -> CompactReport:
+    """
+    Export the stored model as compact artifact and compare both of them on the
+    whole dataset. `kwargs` are passed to `export()`.
+
+    :raise FileNotFoundError: When the model is not trained yet.
+    """
+    from src.property.entity import ALL_PROPERTY
+
+    model_path = prop_utils.get_model_path(prop_type, dataset_type, model_type)
+    compact_path = prop_utils.get_compact_model_path(
+        prop_type, dataset_type, model_type
+    )
+
+    start = time.perf_counter()
+    pipeline: Pipeline = io.dill_load(model_path)
+    dill_load_time = time.perf_counter() - start
+
+    export(
+        pipeline,
+        compact_path,
+        source_digest=io.stored_file_digest(model_path),
+        **kwargs,
+    )
+
+    start = time.perf_counter()
+    model = load(compact_path)
+    compact_load_time = time.perf_counter() - start
+
+    X = io.read_dataset(
+        prop_utils.get_dataset_path(prop_type, dataset_type),
+        columns=ALL_PROPERTY[prop_type].schema.ALL_COLS,
+    )
+    # Models predict `log1p(PRICE)`, compare the real prices
+    expected = np.expm1(pipeline.predict(X))
+    delta = np.abs(np.expm1(model.predict(X)) - expected)
+
+    return CompactReport(
+        prop_type=prop_type,
+        dataset_type=dataset_type,
+        n_nodes=model.forest.n_nodes,
+        dill_size=model_path.stat().st_size,
+        compact_size=dir_size(compact_path),
+        dill_load_time=dill_load_time,
+        compact_load_time=compact_load_time,
+        max_abs_delta=float(delta.max(initial=0)),
+        max_rel_delta=float((delta / expected).max(initial=0)),
+        mean_rel_delta=float((delta / expected).mean()) if len(X) else 0.0,
+    )
+
+
+def main() -> None:
+    from src.property.entity import ALL_PROPERTY
+
+    parser = argparse.ArgumentParser(description="Export the compact model artifacts.")
+    parser.add_argument(
+        "--dataset-type", nargs="+", choices=["main", "user"], default=["main"]
+    )
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--n-estimators", type=int, default=None)
+    parser.add_argument("--float32", action="store_true")
+    args = parser.parse_args()
+
+    for dataset_type in args.dataset_type:
+        for prop_type in ALL_PROPERTY:
+            try:
+                r = export_model(
+                    prop_type,
+                    dataset_type,
+                    max_depth=args.max_depth,
+                    n_estimators=args.n_estimators,
+                    float32=args.float32,
+                )
+            except FileNotFoundError:
+                print(f"{dataset_type:>5} {prop_type:<15} not trained")
+                continue
+            print(
+                f"{dataset_type:>5} {prop_type:<15}"
+                f" size {r.dill_size / 2**20:7.1f}MB -> {r.compact_size / 2**20:6.1f}MB"
+                f" load {r.dill_load_time:6.3f}s -> {r.compact_load_time:6.3f}s"
+                f" delta max {r.max_abs_delta:.4g} ({r.max_rel_delta:.2%})"
+                f" mean {r.mean_rel_delta:.2%}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,26 @@
+import argparse
 import json
+import time
 from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable
 
 import numpy as np
+import pandas as pd
 from pydantic import BaseModel, Field, NaiveDatetime
+from sklearn.base import clone
 from sklearn.metrics import mean_absolute_error
-from sklearn.model_selection import cross_val_score, train_test_split
+from sklearn.model_selection import cross_validate, train_test_split
 from sklearn.pipeline import Pipeline
 from streamlit.elements.lib.mutable_status_container import StatusContainer
 
+from src.core import constants as C
 from src.core import io
 from src.core.errors import ModelNotFoundError
+from src.core.jobs import Job, JobContext, job_manager
+from src.core.locks import file_lock
+from src.data.schema_reader import SchemaReader
+from src.ml.registry import model_registry
 from src.property import _utils
 from src.property import _utils as prop_utils
 from src.typing import DatasetType, ModelType, PropertyAlias
@@ -21,6 +32,9 @@ class ModelDetailsItem(BaseModel):
     r2_score_mean: float
     r2_score_std: float
     mae: float
+    training_time: float | None = None  # Mean seconds to fit a CV fold
+    model_size: int | None = None  # Bytes of the stored model
+    latency_per_row: float | None = None  # Median seconds to predict a single row
     created_at: NaiveDatetime = Field(default_factory=datetime.now)
 
 
@@ -57,18 +71,83 @@ class GetModelDetails:
         return ModelDetailsJSON(**data)
 
     def dump_details(self, data: ModelDetailsJSON) -> None:
-        with open(self.model_details_path, "w") as f:
-            json.dump(data.model_dump(), f, indent=2, default=_json_default)
+        io.write_text(
+            self.model_details_path,
+            json.dumps(data.model_dump(), indent=2, default=_json_default),
+        )
 
     def append_details(self, details: ModelDetailsItem) -> None:
-        data = self.load_details()
-        getattr(data, self.property_type).append(details)
-        self.dump_details(data)
-
-    def store_model_details(self, st_status: StatusContainer) -> None:
-        df = io.read_csv(
-            prop_utils.get_dataset_path(self.property_type, self.dataset_type)
+        # Evaluation jobs of other properties may append to the same file
+        with file_lock(self.model_details_path):
+            data = self.load_details()
+            getattr(data, self.property_type).append(details)
+            self.dump_details(data)
+
+    def latency_per_row(self, X: pd.DataFrame, n_rows: int = 20) -> float:
+        """Median time to predict a single row with the model served by the app."""
+        model = model_registry.get(
+            self.property_type, self.dataset_type, self.model_type
+        )
+        timings = []
+        for i in range(min(n_rows, len(X))):
+            start = time.perf_counter()
+            model.predict(X.iloc[[i]])
+            timings.append(time.perf_counter() - start)
+        return float(np.median(timings)) if timings else 0.0
+
+    @staticmethod
+    def _load_cv_cache(cache_path: Path) -> dict[str, Any]:
+        try:
+            return json.loads(cache_path.read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _cross_validate(
+        self, pipeline: Pipeline, X: pd.DataFrame, y: pd.Series, cache_key: str
+    ) -> dict[str, list[float]]:
+        """
+        5-fold CV of `pipeline` with the folds fitted in parallel. The results are
+        cached by the digests of the dataset and the model, the latest per property.
+        """
+        cache_path = self.model_details_path.with_suffix(".cv_cache.json")
+        cached = self._load_cv_cache(cache_path).get(self.property_type)
+        if cached and cached["key"] == cache_key:
+            return cached["results"]
+
+        # The folds are fitted in parallel, so each fold uses a single core
+        estimator = clone(pipeline)
+        if "reg_model__n_jobs" in estimator.get_params():
+            estimator.set_params(reg_model__n_jobs=1)
+
+        cv_results = cross_validate(
+            estimator=estimator, X=X, y=y, cv=5, scoring="r2", n_jobs=C.CV_N_JOBS
+        )
+        results = {k: cv_results[k].tolist() for k in ("test_score", "fit_time")}
+
+        # Read again, as the other properties may be cached while this one is fitted
+        with file_lock(cache_path):
+            cache = self._load_cv_cache(cache_path)
+            cache[self.property_type] = {"key": cache_key, "results": results}
+            io.write_text(cache_path, json.dumps(cache, indent=2))
+        return results
+
+    def evaluate(
+        self, progress: Callable[[str], Any] = lambda msg: None
+    ) -> ModelDetailsItem:
+        """
+        Score the stored model, `progress` is called with the name of each step.
+        `predict_error` is set when the model fails to predict `X_test`.
+        """
+        self.predict_error: str | None = None
+        schema = SchemaReader(self.property_type)
+        dataset_path = prop_utils.get_dataset_path(
+            self.property_type, self.dataset_type
+        )
+        model_path = prop_utils.get_model_path(
+            self.property_type, self.dataset_type, self.model_type
         )
+
+        df = io.read_dataset(dataset_path, columns=schema.ALL_COLS + [schema.TARGET])
         X = df.drop(columns=["PRICE"])
         y = np.log1p(df["PRICE"])
         X_train, X_test, y_train, y_test = train_test_split(
@@ -76,39 +155,98 @@ class GetModelDetails:
         )
 
         try:
-            pipeline: Pipeline = io.dill_load(
-                prop_utils.get_model_path(
-                    self.property_type, self.dataset_type, self.model_type
-                )
+            pipeline: Pipeline = model_registry.get(
+                self.property_type, self.dataset_type, self.model_type, mmap=False
             )
         except FileNotFoundError:
             raise ModelNotFoundError(
                 f"Model for {self.property_type} is not trained yet."
             )
 
-        st_status.write("Calculating Cross Validation Score (R2 Score)...")
-        scores = cross_val_score(
-            estimator=pipeline, X=X_train, y=y_train, cv=5, scoring="r2"
+        progress("Calculating Cross Validation Score (R2 Score)...")
+        cache_key = (
+            f"{io.dataset_digest(dataset_path)}:{io.stored_file_digest(model_path)}"
         )
+        cv_results = self._cross_validate(pipeline, X_train, y_train, cache_key)
+        scores = np.array(cv_results["test_score"])
+
+        progress("Measuring the prediction latency of the served model...")
+        latency_per_row = self.latency_per_row(X_test)
 
         try:
-            st_status.write("Predicting `X_test` for more scoring metrics...")
+            progress("Predicting `X_test` for more scoring metrics...")
             y_pred = np.expm1(pipeline.predict(X_test))
         except ValueError as e:  # When any/some predicted value become inf or NaN
-            st_status.error(str(e), icon="🛑")
-            st_status.update(
-                label="Error while predicting `X_test`.", expanded=False, state="error"
-            )
+            self.predict_error = str(e)
             y_pred = y_test
 
-        st_status.write("Creating model scores details...")
-        details = ModelDetailsItem(
+        progress("Creating model scores details...")
+        return ModelDetailsItem(
             class_name=pipeline.named_steps["reg_model"].__class__.__name__,
             r2_score_mean=round(scores.mean(), 3),
             r2_score_std=round(scores.std(), 3),
             mae=round(float(mean_absolute_error(np.expm1(y_test), y_pred)), 3),
+            training_time=round(float(np.mean(cv_results["fit_time"])), 3),
+            model_size=model_path.stat().st_size,
+            latency_per_row=latency_per_row,
         )
 
+    def store_model_details(self, st_status: StatusContainer) -> None:
+        details = self.evaluate(st_status.write)
+        if self.predict_error is not None:
+            st_status.error(self.predict_error, icon="🛑")
+            st_status.update(
+                label="Error while predicting `X_test`.", expanded=False, state="error"
+            )
+
         st_status.write("Storing model details...")
         self.append_details(details)
         st_status.write("Storing model details complete.")
+
+
+def evaluate_job(
+    ctx: JobContext,
+    dataset_type: DatasetType,
+    prop_types: list[PropertyAlias] | None = None,
+    model_type: ModelType = "price_predictor",
+) -> None:
+    """
+    Background job to evaluate the trained models of `prop_types` (all by default)
+    and append their details into `models/<dataset_type>/<model_type>.json`.
+    """
+    from src.property.entity import ALL_PROPERTY
+
+    for prop_type in prop_types or list(ALL_PROPERTY):
+        if not prop_utils.get_model_path(prop_type, dataset_type, model_type).exists():
+            continue
+        with ctx.stage(prop_type):
+            details = GetModelDetails(
+                property_type=prop_type,
+                dataset_type=dataset_type,
+                model_type=model_type,
+            )
+            details.append_details(details.evaluate())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Evaluate the trained models.")
+    parser.add_argument("--dataset-type", choices=["main", "user"], default="main")
+    parser.add_argument("--prop-type", nargs="+", default=None)
+    args = parser.parse_args()
+
+    job = job_manager.submit(
+        "evaluate",
+        evaluate_job,
+        dataset_type=args.dataset_type,
+        prop_types=args.prop_type,
+    )
+    while (job := Job.load(job.id)).is_active:
+        time.sleep(1)
+
+    for stage in job.stages:
+        print(f"{stage.name:<15} {stage.elapsed or 0:7.2f}s")
+    print(f"Job {job.id} {job.status}" + (f"\n{job.error}" if job.error else ""))
+
+
+if __name__ == "__main__":
+    main()
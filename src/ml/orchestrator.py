@@ -0,0 +1,159 @@
+"""
+Train the price predictor models of every property in parallel processes.
+
+```sh
+python -m src.ml.orchestrator --workers 3 --n-jobs 2 --dataset-type main user
+```
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Literal
+
+from pydantic import BaseModel
+
+from src.core import io
+from src.core.jobs import JobContext
+from src.property import _utils as prop_utils
+from src.typing import DatasetType, PropertyAlias
+
+TrainingJob = tuple[PropertyAlias, DatasetType]
+
+
+class TrainingReport(BaseModel):
+    prop_type: PropertyAlias
+    dataset_type: DatasetType
+    status: Literal["trained", "skipped", "failed"]
+    wall_time: float = 0.0
+    error: str | None = None
+
+
+def all_jobs(dataset_types: list[DatasetType] | None = None) -> list[TrainingJob]:
+    from src.property.entity import ALL_PROPERTY
+
+    return [
+        (prop_type, dataset_type)
+        for dataset_type in dataset_types or ["main", "user"]
+        for prop_type in ALL_PROPERTY
+    ]
+
+
+def train_one(
+    prop_type: PropertyAlias, dataset_type: DatasetType, n_jobs: int | None = None
+) -> TrainingReport:
+    """Train a single model, used as the task of the worker processes."""
+    from src.ml.price_predictor import PricePredictor
+    from src.property.entity import ALL_PROPERTY
+
+    if not io.dataset_exists(prop_utils.get_dataset_path(prop_type, dataset_type)):
+        return TrainingReport(
+            prop_type=prop_type, dataset_type=dataset_type, status="skipped"
+        )
+
+    start = time.perf_counter()
+    try:
+        PricePredictor(ALL_PROPERTY[prop_type], dataset_type, n_jobs).train()
+    except Exception as e:
+        return TrainingReport(
+            prop_type=prop_type,
+            dataset_type=dataset_type,
+            status="failed",
+            wall_time=time.perf_counter() - start,
+            error=repr(e),
+        )
+
+    return TrainingReport(
+        prop_type=prop_type,
+        dataset_type=dataset_type,
+        status="trained",
+        wall_time=time.perf_counter() - start,
+    )
+
+
+def train_all(
+    jobs: list[TrainingJob] | None = None,
+    max_workers: int | None = None,
+    n_jobs: int | None = None,
+) -> list[TrainingReport]:
+    """
+    Train the models of `jobs` (all models by default) in a process pool.
+
+    :max_workers: Number of models trained at once, defaults to the number of jobs
+        capped by the number of CPU cores.
+    :n_jobs: CPU cores used by each model, defaults to an even share of the cores.
+    """
+    jobs = jobs or all_jobs()
+    cpu_count = os.cpu_count() or 1
+    max_workers = max_workers or min(len(jobs), cpu_count)
+    n_jobs = n_jobs or max(1, cpu_count // max_workers)
+
+    # `spawn` because the streamlit app forks with its threads running
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(max_workers, mp_context=ctx) as executor:
+        futures = [executor.submit(train_one, *job, n_jobs) for job in jobs]
+        reports = [f.result() for f in as_completed(futures)]
+
+    order = {job: i for i, job in enumerate(jobs)}
+    return sorted(reports, key=lambda x: order[(x.prop_type, x.dataset_type)])
+
+
+def train_job(
+    ctx: JobContext,
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    n_jobs: int | None = None,
+) -> None:
+    """Background job to train a single model."""
+    from src.ml.price_predictor import PricePredictor
+    from src.property.entity import ALL_PROPERTY
+
+    predictor = PricePredictor(ALL_PROPERTY[prop_type], dataset_type, n_jobs)
+    with ctx.stage("load_dataset"):
+        X, y = predictor.load_dataset()
+    with ctx.stage("fit"):
+        pipeline = predictor.fit(X, y)
+    with ctx.stage("store"):
+        predictor.store(pipeline)
+
+
+def train_all_job(
+    ctx: JobContext,
+    dataset_types: list[DatasetType] | None = None,
+    max_workers: int | None = None,
+    n_jobs: int | None = None,
+) -> None:
+    """Background job to train all the models with `train_all()`."""
+    reports = train_all(all_jobs(dataset_types), max_workers, n_jobs)
+    for r in reports:
+        ctx.record(f"{r.dataset_type}/{r.prop_type} ({r.status})", r.wall_time)
+
+    if failed := [
+        f"{r.dataset_type}/{r.prop_type}: {r.error}" for r in reports if r.error
+    ]:
+        raise RuntimeError("Training failed for " + "; ".join(failed))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train all price predictor models.")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--n-jobs", type=int, default=None)
+    parser.add_argument(
+        "--dataset-type", nargs="+", choices=["main", "user"], default=None
+    )
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    reports = train_all(all_jobs(args.dataset_type), args.workers, args.n_jobs)
+    for r in reports:
+        print(
+            f"{r.dataset_type:>5} {r.prop_type:<15} {r.status:<8} {r.wall_time:7.2f}s"
+            + (f"  {r.error}" if r.error else "")
+        )
+    print(f"Total wall time: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,105 +1,261 @@
+import os
+import shutil
+from pathlib import Path
 from typing import Literal
 
 import numpy as np
 import pandas as pd
 from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.pipeline import FunctionTransformer, Pipeline
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.pipeline import FunctionTransformer, Pipeline, make_pipeline
 from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
 
+from src.core import constants as C
 from src.core import io
 from src.core.errors import ModelNotFoundError
+from src.ml import compact
+from src.ml.registry import model_registry
 from src.property import _utils as prop_utils
 from src.property.property_type import PropertyType
-from src.typing import DatasetType
+from src.typing import DatasetType, EstimatorName
+
+# Categories of a feature which `HistGradientBoostingRegressor` can handle natively,
+# the infrequent ones are grouped together above this.
+HGB_MAX_CATEGORIES = 255
 
 
 class PricePredictor:
     model_type: Literal["price_predictor"] = "price_predictor"
 
-    def __init__(self, obj: PropertyType, dataset_type: DatasetType) -> None:
+    def __init__(
+        self,
+        obj: PropertyType,
+        dataset_type: DatasetType,
+        n_jobs: int | None = None,
+        sparse: bool = C.SPARSE_OHE,
+        estimator: EstimatorName | None = None,
+    ) -> None:
+        """
+        :n_jobs: Number of CPU cores used by the model while training and predicting.
+        :sparse: Train with the sparse one-hot encoding, see `preprocessor()`.
+        :estimator: Defaults to the `estimator` of the property in the schema.
+        """
         self.prop = obj
         self.dataset_type: DatasetType = dataset_type
+        self.n_jobs = n_jobs
+        self.sparse = sparse
+        self.estimator: EstimatorName = estimator or obj.schema.ESTIMATOR
 
     @staticmethod
     def preprocessor(
-        ord_cols: dict[str, list[str | int]], ohe_cols: list[str]
+        ord_cols: dict[str, list[str | int]], ohe_cols: list[str], sparse: bool = False
     ) -> ColumnTransformer:
+        """
+        :sparse: Keep the one-hot encoded columns sparse and scale only the numeric
+            and ordinal columns, instead of scaling the whole dense matrix.
+        """
+        log1p_area = FunctionTransformer(
+            func=np.log1p, inverse_func=np.expm1, validate=True
+        )
+        ord_encoder = OrdinalEncoder(categories=list(ord_cols.values()))
+        if sparse:
+            log1p_area = make_pipeline(log1p_area, StandardScaler())
+            ord_encoder = make_pipeline(ord_encoder, StandardScaler())
+
         transformers = [
-            (
-                "log1p_area",
-                FunctionTransformer(
-                    func=np.log1p, inverse_func=np.expm1, validate=True
-                ),
-                ["AREA"],
-            ),
-            (
-                "ord",
-                OrdinalEncoder(categories=list(ord_cols.values())),
-                list(ord_cols.keys()),
-            ),
+            ("log1p_area", log1p_area, ["AREA"]),
+            ("ord", ord_encoder, list(ord_cols.keys())),
             (
                 "ohe",
                 # FIXME: Improve the OneHotEncoding.
                 # TODO: Remove `handle_unknown` parameter and do something else.
-                OneHotEncoder(sparse_output=False, handle_unknown="ignore"),
+                OneHotEncoder(sparse_output=sparse, handle_unknown="ignore"),
                 ohe_cols,
             ),
         ]
 
-        preprocessor = ColumnTransformer(transformers=transformers, remainder="drop")
+        preprocessor = ColumnTransformer(
+            transformers=transformers,
+            remainder="drop",
+            sparse_threshold=1.0 if sparse else 0.0,
+        )
         return preprocessor
 
     @staticmethod
-    def pipeline(preprocessor: ColumnTransformer | None) -> Pipeline:
+    def pipeline(
+        preprocessor: ColumnTransformer | None,
+        n_jobs: int | None = None,
+        sparse: bool = False,
+    ) -> Pipeline:
+        """:sparse: The `preprocessor` already scales, see `preprocessor()`."""
         pipe = Pipeline(
             steps=[
-                ("scaler", StandardScaler()),
-                ("reg_model", RandomForestRegressor(n_estimators=500)),
+                ("reg_model", RandomForestRegressor(n_estimators=500, n_jobs=n_jobs)),
             ]
         )
+        if not sparse:
+            pipe.steps.insert(0, ("scaler", StandardScaler()))
         if preprocessor:
             pipe.steps.insert(0, ("preprocessor", preprocessor))
         return pipe
 
-    def train(self) -> None:
+    @staticmethod
+    def hgb_pipeline(
+        ord_cols: dict[str, list[str | int]], cat_cols: list[str]
+    ) -> Pipeline:
         """
-        Train a model to predict PRICE using `RandomForestRegressor`.
-
-        **Note:** Use `np.expm1` function after prediction to get the real price because
-        the PRICE feature is right skewed.
+        `HistGradientBoostingRegressor` with native categorical support, `cat_cols`
+        are ordinal encoded instead of one-hot encoded and no scaling is required.
         """
-        df = io.read_csv(
-            prop_utils.get_dataset_path(self.prop.prop_type, self.dataset_type)
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ("log1p_area", FunctionTransformer(func=np.log1p), ["AREA"]),
+                (
+                    "ord",
+                    OrdinalEncoder(categories=list(ord_cols.values())),
+                    list(ord_cols.keys()),
+                ),
+                (
+                    "cat",
+                    # Unknown categories are treated as missing values by the model
+                    OrdinalEncoder(
+                        handle_unknown="use_encoded_value",
+                        unknown_value=np.nan,
+                        max_categories=HGB_MAX_CATEGORIES,
+                    ),
+                    cat_cols,
+                ),
+            ],
+            remainder="drop",
+        )
+        n_features = 1 + len(ord_cols)
+        reg_model = HistGradientBoostingRegressor(
+            max_iter=500,
+            categorical_features=list(range(n_features, n_features + len(cat_cols))),
+            random_state=42,
+        )
+        return Pipeline(
+            steps=[("preprocessor", preprocessor), ("reg_model", reg_model)]
+        )
+
+    def load_dataset(self) -> tuple[pd.DataFrame, pd.Series]:
+        df = io.read_dataset(
+            prop_utils.get_dataset_path(self.prop.prop_type, self.dataset_type),
+            columns=self.prop.schema.ALL_COLS + [self.prop.schema.TARGET],
         )
         X = df.drop(columns=["PRICE"])
         y = np.log1p(df["PRICE"])
+        return X, y
 
-        # Create pipeline and train the model
-        preprocessor = self.preprocessor(
-            self.prop._ord_cols, self.prop.schema.CAT_COLS["ohe_cols"]
-        )
-        pipeline = self.pipeline(preprocessor)
+    def fit(self, X: pd.DataFrame, y: pd.Series) -> Pipeline:
+        ord_cols, ohe_cols = self.prop._ord_cols, self.prop.schema.CAT_COLS["ohe_cols"]
+        if self.estimator == "hist_gradient_boosting":
+            pipeline = self.hgb_pipeline(ord_cols, ohe_cols)
+        else:
+            preprocessor = self.preprocessor(ord_cols, ohe_cols, self.sparse)
+            pipeline = self.pipeline(preprocessor, self.n_jobs, self.sparse)
         pipeline.fit(X, y)
+        return pipeline
 
-        # Store the trained model
-        model_path = prop_utils.get_model_path(
-            self.prop.prop_type, self.dataset_type, self.model_type
-        )
-        io.dill_dump(pipeline, model_path)
+    def store(self, pipeline: Pipeline) -> None:
+        """
+        Store the trained model along with its compact artifact, they replace the
+        served model atomically.
 
-    def predict(self, df: pd.DataFrame) -> float:
-        # Load the stored model
-        model_path = prop_utils.get_model_path(
-            self.prop.prop_type, self.dataset_type, self.model_type
-        )
+        The compact artifact is exported first, with the digest of the model about to
+        be stored, so a reader never pairs the new artifact with the old model.
+        """
+        key = (self.prop.prop_type, self.dataset_type, self.model_type)
+        model_path = prop_utils.get_model_path(*key)
+        staged_path = model_path.with_name(f".{model_path.name}.{os.getpid()}.staged")
+        io.dill_dump(pipeline, staged_path)
 
+        # Only the forests have a compact artifact, others are served as `Pipeline`
+        is_forest = isinstance(pipeline[-1], RandomForestRegressor)
+        compact_path = prop_utils.get_compact_model_path(*key)
         try:
-            pipeline: Pipeline = io.dill_load(model_path)
+            digest = io.file_digest(staged_path)
+            if is_forest:
+                compact.export(pipeline, compact_path, source_digest=digest)
+            else:
+                # The artifact of an earlier forest would be offered as this model
+                shutil.rmtree(compact_path, ignore_errors=True)
+            staged_path.replace(model_path)
+        finally:
+            staged_path.unlink(missing_ok=True)
+        # Recorded so the registry never hashes the model again
+        io.store_file_digest(model_path, digest)
+
+        if is_forest and C.MODEL_MMAP:
+            model_registry.put(compact.load(compact_path, mmap=True), *key)
+        else:
+            model_registry.put(pipeline, *key)
+
+    def train(self) -> None:
+        """
+        Train a model to predict PRICE using the `estimator`.
+
+        **Note:** Use `np.expm1` function after prediction to get the real price because
+        the PRICE feature is right skewed.
+        """
+        X, y = self.load_dataset()
+        pipeline = self.fit(X, y)
+        self.store(pipeline)
+
+    def _load_pipeline(self) -> Pipeline | compact.CompactModel:
+        # Load the stored model (served from the registry when unchanged on disk)
+        try:
+            pipeline = model_registry.get(
+                self.prop.prop_type, self.dataset_type, self.model_type
+            )
         except FileNotFoundError:
             raise ModelNotFoundError(
                 f"Price predictor model not found. Please try to train for `{self.prop.prop_type}`."
             )
+        return pipeline
+
+    def predict_batch(self, df: pd.DataFrame) -> pd.Series:
+        """Predict the PRICE of every row of `df`, aligned to the index of `df`."""
+        pipeline = self._load_pipeline()
+        pred_price = np.expm1(pipeline.predict(df[self.prop.schema.ALL_COLS]))
+        return pd.Series(pred_price, index=df.index, name="PRED_PRICE")
+
+    def predict(self, df: pd.DataFrame) -> float:
+        return self.predict_batch(df).iloc[0]
+
+    def score_csv(
+        self,
+        input_fp: Path,
+        output_fp: Path,
+        chunksize: int = 50_000,
+    ) -> int:
+        """
+        Stream `input_fp` through the model in chunks and write every row along with
+        its `PRED_PRICE` into `output_fp`.
+
+        :return: Number of rows scored, `output_fp` is not written when it is 0.
+        """
+        self._load_pipeline()  # Fail early when the model is not trained yet
+
+        n_rows = 0
+        tmp_fp = output_fp.with_name(f".{output_fp.name}.tmp")
+        try:
+            with pd.read_csv(input_fp, chunksize=chunksize) as reader:
+                for chunk in reader:
+                    if chunk.empty:
+                        continue
+                    chunk["PRED_PRICE"] = self.predict_batch(chunk)
+                    chunk.to_csv(
+                        tmp_fp,
+                        mode="a" if n_rows else "w",
+                        header=not n_rows,
+                        index=False,
+                    )
+                    n_rows += len(chunk)
 
-        pred_price = np.expm1(pipeline.predict(df))
-        return pred_price[0]
+            if n_rows:
+                tmp_fp.replace(output_fp)
+        finally:
+            # Left only when a chunk failed to be scored
+            tmp_fp.unlink(missing_ok=True)
+        return n_rows
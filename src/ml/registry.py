@@ -0,0 +1,194 @@
+"""
+Process-wide registry of the loaded ML models.
+
+Loading a `.dill` pipeline is much slower than predicting with it, so the registry
+keeps the recently used pipelines in memory and only reloads one when its file on
+disk has changed (e.g. after `PricePredictor.train()`).
+
+With `mmap=True` a model is served from its compact artifact (see `src.ml.compact`)
+when it is exported from the current `.dill` file. The tree arrays are memory-mapped,
+so their pages are shared by every session and every process of the host.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Self
+
+from pydantic import BaseModel
+
+from src.core import constants as C
+from src.core import io
+from src.ml import compact
+from src.property import _utils as prop_utils
+from src.typing import DatasetType, ModelType, PropertyAlias
+
+RegistryKey = tuple[PropertyAlias, DatasetType, ModelType, bool]
+
+
+class RegistryStats(BaseModel):
+    hits: int = 0
+    misses: int = 0
+    reloads: int = 0
+    evictions: int = 0
+    load_time_total: float = 0.0
+    load_time_last: float = 0.0
+
+
+class _Entry:
+    __slots__ = ("obj", "mtime_ns", "size", "digest")
+
+    def __init__(self, obj: Any, mtime_ns: int, size: int, digest: str) -> None:
+        self.obj = obj
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.digest = digest
+
+
+class ModelRegistry:
+    """
+    Bounded LRU cache of loaded models keyed by `(prop_type, dataset_type, model_type)`
+    and whether the compact artifact is served (`mmap`).
+
+    A cached model is served as long as the `mtime`/size of its file are unchanged.
+    When they change, the file's digest is compared to decide whether it must be
+    reloaded, so a plain `touch` does not trigger a reload. The digest recorded when
+    the model is stored is used, so a model is hashed only when changed otherwise.
+    """
+
+    _instance = None
+
+    def __new__(cls) -> Self:
+        if cls._instance is None:
+            cls._instance = super(ModelRegistry, cls).__new__(cls)
+            cls._instance._init_registry(C.MODEL_REGISTRY_MAXSIZE)
+        return cls._instance
+
+    def _init_registry(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.stats = RegistryStats()
+        self._entries: OrderedDict[RegistryKey, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        # Held while loading a model, so it is loaded once but doesn't block others
+        self._load_locks: dict[RegistryKey, threading.Lock] = {}
+
+    def _load(self, key: RegistryKey, fp: Path, digest: str) -> _Entry:
+        start = time.perf_counter()
+        stat = fp.stat()
+
+        compact_path = prop_utils.get_compact_model_path(*key[:3])
+        if key[3] and compact.is_current(compact_path, digest):
+            obj = compact.load(compact_path, mmap=True)
+        else:
+            obj = io.dill_load(fp)
+
+        entry = _Entry(obj, stat.st_mtime_ns, stat.st_size, digest)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.stats.load_time_last = elapsed
+            self.stats.load_time_total += elapsed
+            self._store(key, entry)
+        return entry
+
+    def _store(self, key: RegistryKey, entry: _Entry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+
+    def _cached(self, key: RegistryKey, fp: Path) -> _Entry | None:
+        """Entry of `key` if its file is unchanged, call with `_lock` held."""
+        try:
+            stat = fp.stat()
+        except FileNotFoundError:
+            self._entries.pop(key, None)
+            raise
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if (entry.mtime_ns, entry.size) != (stat.st_mtime_ns, stat.st_size):
+            return None
+
+        self.stats.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(
+        self,
+        prop_type: PropertyAlias,
+        dataset_type: DatasetType,
+        model_type: ModelType,
+        mmap: bool = C.MODEL_MMAP,
+    ) -> Any:
+        """
+        Return the loaded model, loading it from disk only when required.
+
+        :mmap: Serve the memory-mapped compact artifact when it is current, which only
+            supports `predict()`. Use `False` to always get the `Pipeline`.
+        :raise FileNotFoundError: When the model is not trained yet.
+        """
+        key: RegistryKey = (prop_type, dataset_type, model_type, mmap)
+        fp = prop_utils.get_model_path(prop_type, dataset_type, model_type)
+
+        with self._lock:
+            if (entry := self._cached(key, fp)) is not None:
+                return entry.obj
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            with self._lock:
+                # Loaded by another thread while this one waited
+                if (entry := self._cached(key, fp)) is not None:
+                    return entry.obj
+                entry = self._entries.get(key)
+
+            # Recorded when the model is stored, it's hashed only if changed since
+            digest = io.stored_file_digest(fp)
+            if entry is not None and digest == entry.digest:
+                stat = fp.stat()  # Only touched, e.g. copied over with the same model
+                with self._lock:
+                    entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+                    self.stats.hits += 1
+                return entry.obj
+
+            with self._lock:
+                if entry is None:
+                    self.stats.misses += 1
+                else:
+                    self.stats.reloads += 1
+            return self._load(key, fp, digest).obj
+
+    def put(
+        self,
+        obj: Any,
+        prop_type: PropertyAlias,
+        dataset_type: DatasetType,
+        model_type: ModelType,
+        mmap: bool = C.MODEL_MMAP,
+    ) -> None:
+        """Register a freshly stored model so the next `get()` does not reload it."""
+        key: RegistryKey = (prop_type, dataset_type, model_type, mmap)
+        fp = prop_utils.get_model_path(prop_type, dataset_type, model_type)
+
+        stat, digest = fp.stat(), io.stored_file_digest(fp)
+        with self._lock:
+            self._store(key, _Entry(obj, stat.st_mtime_ns, stat.st_size, digest))
+
+    def invalidate(self, key: RegistryKey | None = None) -> None:
+        """Drop `key` from the registry or clear it when `key` is `None`."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+model_registry = ModelRegistry()
@@ -2,6 +2,7 @@ from pathlib import Path
 
 import pandas as pd
 
+from src.core import constants as C
 from src.typing import DatasetType, ModelType, PropertyAlias
 
 ORD_COLS_MAPPING = {
@@ -55,5 +56,25 @@ def get_model_path(
     return Path("models") / dataset_type / model_type / f"{prop_type}.dill"
 
 
+def get_compact_model_path(
+    prop_type: PropertyAlias, dataset_type: DatasetType, model_type: ModelType
+) -> Path:
+    """Directory of the compact artifact of the model, see `src.ml.compact`."""
+    return Path("models") / dataset_type / model_type / f"{prop_type}.compact"
+
+
 def get_dataset_path(prop_type: PropertyAlias, dataset_type: DatasetType) -> Path:
-    return Path("data") / dataset_type / f"{prop_type}.csv"
+    return Path("data") / dataset_type / f"{prop_type}{C.DATASET_SUFFIX}"
+
+
+def get_locality_index_path(
+    prop_type: PropertyAlias, dataset_type: DatasetType
+) -> Path:
+    return Path("data") / dataset_type / f"{prop_type}.localities.json"
+
+
+def get_locality_stats_path(
+    prop_type: PropertyAlias, dataset_type: DatasetType
+) -> Path:
+    """Aggregates of the dataset, see `src.property.locality_stats`."""
+    return Path("data") / dataset_type / f"{prop_type}.stats{C.DATASET_SUFFIX}"
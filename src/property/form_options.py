@@ -1,9 +1,8 @@
-from pathlib import Path
 from typing import Self
 
-import streamlit as st
-
-from src.core import io
+from src.data import facets
+from src.property import _utils as prop_utils
+from src.property import locality_index
 from src.typing import DatasetType, PropertyAlias
 
 
@@ -17,24 +16,9 @@ class FormOptions:
         return cls._instance
 
     def _init_options(self) -> None:
-        self.FURNISH: list[str] = ["unfurnished", "semifurnished", "furnished"]
-        self.FACING: list[str] = [
-            "north-east",
-            "east",
-            "north",
-            "south-east",
-            "south",
-            "west",
-            "south-west",
-            "north-west",
-        ]
-        self.AGE: list[str] = [
-            "10+ year old property",
-            "5-10 year old property",
-            "1-5 year old property",
-            "0-1 year old property",
-            "under construction",
-        ]
+        self.FURNISH: list[str] = self._facet_options("FURNISH")
+        self.FACING: list[str] = self._facet_options("FACING")
+        self.AGE: list[str] = self._facet_options("AGE")
         self.BEDROOM_NUM: list[int] = [1, 2, 3, 4, 5, 99]
         self.BALCONY_NUM: list[int] = [0, 1, 2, 3, 4, 99]
         self.FLOOR_NUM: list[str] = ["low rise", "mid rise", "high rise"]
@@ -43,27 +27,59 @@ class FormOptions:
             1: "Semi-Luxury",
             2: "Full-Luxury",
         }
+        self._locality_cache: dict[
+            tuple[DatasetType, PropertyAlias],
+            tuple[int, tuple[list[str], dict[str, list[str]]]],
+        ] = {}
 
     @staticmethod
-    @st.cache_data
-    def CITY(dataset_type: DatasetType, prop_type: PropertyAlias) -> list[str]:
-        fp = Path("data") / dataset_type / f"{prop_type}.csv"
-        df = io.read_csv(fp)
+    def _facet_options(name: str) -> list[str]:
+        """Labels of the facet, in the order of the ordinal column if it is one."""
+        options = facets.get(name).options
+        if (order := prop_utils.ORD_COLS_MAPPING.get(name)) is None:
+            return options
+        return sorted(
+            options, key=lambda x: order.index(x) if x in order else len(order)
+        )
 
-        cities = df["CITY"].unique().tolist()
-        return sorted(map(lambda x: x.title(), cities))
+    def _locality_options(
+        self, dataset_type: DatasetType, prop_type: PropertyAlias
+    ) -> tuple[list[str], dict[str, list[str]]]:
+        """
+        Return the CITY options and LOCALITY_NAME options of each city from the
+        persistent locality index, re-read only when the index file changes.
+        """
+        fp = prop_utils.get_locality_index_path(prop_type, dataset_type)
+        try:
+            mtime_ns = fp.stat().st_mtime_ns
+        except FileNotFoundError:
+            locality_index.rebuild(prop_type, dataset_type)
+            mtime_ns = fp.stat().st_mtime_ns
+
+        key = (dataset_type, prop_type)
+        cached = self._locality_cache.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        index = locality_index.load(prop_type, dataset_type) or {}
+        options = (
+            sorted(map(lambda x: x.title(), index)),
+            {
+                city: sorted(map(lambda x: x.title(), localities))
+                for city, localities in index.items()
+            },
+        )
+        self._locality_cache[key] = (mtime_ns, options)
+        return options
+
+    def CITY(self, dataset_type: DatasetType, prop_type: PropertyAlias) -> list[str]:
+        return self._locality_options(dataset_type, prop_type)[0]
 
-    @staticmethod
-    @st.cache_data
     def LOCALITY_NAME(
-        city_: str, dataset_type: DatasetType, prop_type: PropertyAlias
+        self, city_: str, dataset_type: DatasetType, prop_type: PropertyAlias
     ) -> list[str]:
-        fp = Path("data") / dataset_type / f"{prop_type}.csv"
-        df = io.read_csv(fp)
-
-        city_ = city_.lower()
-        localities = df.query("CITY==@city_")["LOCALITY_NAME"].unique().tolist()
-        return sorted(map(lambda x: x.title(), localities))
+        localities = self._locality_options(dataset_type, prop_type)[1]
+        return localities.get(city_.lower(), [])
 
 
 form_options = FormOptions()
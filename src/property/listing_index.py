@@ -0,0 +1,84 @@
+"""
+`PROP_ID` index of every listing stored in the datasets of a dataset type.
+
+It is made of the memory-mapped `PropIdIndex` of the dataset of each property (see
+`src.core.partitions`), so uploads can drop the already stored listings before any
+decoding and a listing can be looked up by its `PROP_ID` without a full scan.
+"""
+
+import typing as t
+
+import numpy as np
+import pandas as pd
+
+from src.core import io
+from src.core.partitions import PROP_ID_INDEX
+from src.core.prop_index import PROP_ID_PREFIX, PropIdIndex, hash_prop_ids
+from src.property import _utils as prop_utils
+from src.typing import DatasetType, PropertyAlias
+
+_cache: dict[tuple[PropertyAlias, DatasetType], tuple[int, PropIdIndex]] = {}
+
+
+def load(prop_type: PropertyAlias, dataset_type: DatasetType) -> PropIdIndex:
+    """
+    Index of the dataset of `prop_type`, reloaded only when it changes. Datasets
+    stored as a single file have no index on disk, it is built from their PROP_ID.
+    """
+    fp = io.resolve_dataset_path(prop_utils.get_dataset_path(prop_type, dataset_type))
+    if fp.is_dir():
+        fp = fp / PROP_ID_INDEX
+
+    key = (prop_type, dataset_type)
+    try:
+        mtime_ns = fp.stat().st_mtime_ns
+    except FileNotFoundError:
+        _cache.pop(key, None)
+        return PropIdIndex()
+
+    if (cached := _cache.get(key)) is None or cached[0] != mtime_ns:
+        if fp.suffix == ".npy":
+            index = PropIdIndex.load(fp)
+        else:
+            index = PropIdIndex.build(
+                io.read_dataset(fp, columns=["PROP_ID"])["PROP_ID"]
+            )
+        _cache[key] = cached = (mtime_ns, index)
+    return cached[1]
+
+
+def known(dataset_type: DatasetType, prop_ids: pd.Series) -> np.ndarray:
+    """Boolean mask of the `prop_ids` stored in any dataset of `dataset_type`."""
+    hashes = hash_prop_ids(prop_ids)
+    mask = np.zeros(len(hashes), dtype=bool)
+    for prop_type in t.get_args(PropertyAlias):
+        mask |= load(prop_type, dataset_type).contains(hashes)
+    return mask
+
+
+def find(dataset_type: DatasetType, prop_id: str) -> PropertyAlias | None:
+    """Property type of the dataset holding the listing `prop_id`."""
+    hashes = hash_prop_ids(pd.Series([prop_id]))
+    for prop_type in t.get_args(PropertyAlias):
+        if load(prop_type, dataset_type).contains(hashes)[0]:
+            return prop_type
+    return None
+
+
+def lookup(
+    dataset_type: DatasetType, prop_id: str
+) -> tuple[PropertyAlias, pd.DataFrame] | None:
+    """
+    The stored row of the listing `prop_id`, which may be a bare id or its URL.
+
+    :return: Its property type and a single row dataframe, `None` when not stored.
+    """
+    if (prop_type := find(dataset_type, prop_id)) is None:
+        return None
+
+    bare_id = prop_id.strip().upper().removeprefix(PROP_ID_PREFIX.upper())
+    df = io.read_dataset(
+        prop_utils.get_dataset_path(prop_type, dataset_type),
+        filters=[("PROP_ID", "==", PROP_ID_PREFIX + bare_id)],
+    )
+    return prop_type, df.head(1)
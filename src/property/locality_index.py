@@ -0,0 +1,71 @@
+"""
+Persistent `CITY -> LOCALITY_NAME` index of every dataset.
+
+The index is stored next to its dataset and updated whenever the dataset is dumped,
+so the form options never have to read the dataset itself.
+
+Rebuild the indexes of the existing datasets with:
+
+```sh
+python -m src.property.locality_index
+```
+"""
+
+import json
+
+import pandas as pd
+
+from src.core import io
+from src.property import _utils as prop_utils
+from src.typing import DatasetType, PropertyAlias
+
+LocalityIndex = dict[str, list[str]]
+
+
+def build(df: pd.DataFrame, index: LocalityIndex | None = None) -> LocalityIndex:
+    """Build the index of `df`, merged into the existing `index` if passed."""
+    merged: dict[str, set[str]] = {k: set(v) for k, v in (index or {}).items()}
+
+    pairs = df[["CITY", "LOCALITY_NAME"]].dropna().drop_duplicates()
+    for city, localities in pairs.groupby("CITY")["LOCALITY_NAME"]:
+        merged.setdefault(str(city), set()).update(localities)
+
+    return {city: sorted(merged[city]) for city in sorted(merged)}
+
+
+def load(prop_type: PropertyAlias, dataset_type: DatasetType) -> LocalityIndex | None:
+    fp = prop_utils.get_locality_index_path(prop_type, dataset_type)
+    try:
+        return json.loads(fp.read_text())
+    except FileNotFoundError:
+        return None
+
+
+def dump(
+    index: LocalityIndex, prop_type: PropertyAlias, dataset_type: DatasetType
+) -> None:
+    fp = prop_utils.get_locality_index_path(prop_type, dataset_type)
+    tmp_fp = fp.with_name(f".{fp.name}.tmp")
+    tmp_fp.write_text(json.dumps(index, indent=2))
+    tmp_fp.replace(fp)
+
+
+def rebuild(prop_type: PropertyAlias, dataset_type: DatasetType) -> LocalityIndex:
+    """Rebuild the index from the `CITY` and `LOCALITY_NAME` columns of the dataset."""
+    df = io.read_dataset(
+        prop_utils.get_dataset_path(prop_type, dataset_type),
+        columns=["CITY", "LOCALITY_NAME"],
+    )
+    index = build(df)
+    dump(index, prop_type, dataset_type)
+    return index
+
+
+if __name__ == "__main__":
+    from src.property.entity import ALL_PROPERTY
+
+    for dataset_type in ("main", "user"):
+        for prop_type in ALL_PROPERTY:
+            if io.dataset_exists(prop_utils.get_dataset_path(prop_type, dataset_type)):
+                rebuild(prop_type, dataset_type)
+                print(f"Rebuilt locality index of '{dataset_type}/{prop_type}'.")
@@ -0,0 +1,136 @@
+"""
+Pre-aggregated statistics of every dataset by `(CITY, LOCALITY_NAME, BEDROOM_NUM)`.
+
+Each row holds the count, sum, mean and quantiles of `PRICE`, `AREA` and
+`PRICE_PER_SQFT` of a group, rows with `BEDROOM_NUM == ALL_BHK` aggregate all the
+BHKs of a locality. The statistics are stored next to their dataset and updated
+whenever the dataset is dumped, so the analytics never aggregate raw listings.
+
+Rebuild the statistics of the existing datasets with:
+
+```sh
+python -m src.property.locality_stats
+```
+"""
+
+import numpy as np
+import pandas as pd
+
+from src.core import io
+from src.property import _utils as prop_utils
+from src.typing import DatasetType, PropertyAlias
+
+KEYS = ["CITY", "LOCALITY_NAME", "BEDROOM_NUM"]
+METRICS = ["PRICE", "AREA", "PRICE_PER_SQFT"]
+QUANTILES = {"MIN": 0.0, "P25": 0.25, "P50": 0.5, "P75": 0.75, "MAX": 1.0}
+READ_COLS = [*KEYS, "PRICE", "AREA", "LATITUDE", "LONGITUDE"]
+
+# `BEDROOM_NUM` of the rows aggregating all the BHKs of a locality
+ALL_BHK = 0
+
+
+def build(df: pd.DataFrame, stats: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Build the statistics of `df`, the groups of its cities replace the ones of the
+    existing `stats` if passed. So `df` must hold every listing of its cities.
+    """
+    df = df.assign(PRICE_PER_SQFT=df["PRICE"].div(df["AREA"]))
+    if "BEDROOM_NUM" in df:
+        df = pd.concat([df, df.assign(BEDROOM_NUM=ALL_BHK)], ignore_index=True)
+    else:  # e.g. residential land
+        df = df.assign(BEDROOM_NUM=ALL_BHK)
+
+    grp = df.groupby(KEYS)
+    agg = grp[METRICS].agg(["count", "sum", "mean"])
+    agg.columns = [f"{col}_{stat.upper()}" for col, stat in agg.columns]
+    parts = [grp.size().rename("COUNT"), agg]
+
+    for name, q in QUANTILES.items():
+        parts.append(grp[METRICS].quantile(q).add_suffix(f"_{name}"))
+    for col in ("LATITUDE", "LONGITUDE"):
+        if col in df:
+            parts.append(grp[col].mean().rename(f"{col}_MEAN"))
+
+    new_stats = pd.concat(parts, axis="columns").reset_index()
+    if stats is None:
+        return new_stats
+    stats = stats[~stats["CITY"].isin(new_stats["CITY"])]
+    return pd.concat([stats, new_stats], ignore_index=True).sort_values(KEYS)
+
+
+def bhk_means(stats: pd.DataFrame) -> pd.DataFrame:
+    """Mean of each metric by `BEDROOM_NUM` over all the groups of `stats`."""
+    sums = stats.query("BEDROOM_NUM != @ALL_BHK").groupby("BEDROOM_NUM").sum()
+    return pd.DataFrame(
+        {col: sums[f"{col}_SUM"] / sums[f"{col}_COUNT"] for col in METRICS}
+    )
+
+
+def centroid(
+    stats: pd.DataFrame, city: str, locality: str
+) -> tuple[float, float] | None:
+    """Mean `(LATITUDE, LONGITUDE)` of the listings of the locality."""
+    row = stats.query(
+        "CITY==@city and LOCALITY_NAME==@locality and BEDROOM_NUM==@ALL_BHK"
+    )
+    if row.empty or row[["LATITUDE_MEAN", "LONGITUDE_MEAN"]].isna().any(axis=None):
+        return None
+    return row["LATITUDE_MEAN"].iloc[0], row["LONGITUDE_MEAN"].iloc[0]
+
+
+def load(prop_type: PropertyAlias, dataset_type: DatasetType) -> pd.DataFrame | None:
+    fp = prop_utils.get_locality_stats_path(prop_type, dataset_type)
+    if not fp.exists():
+        return None
+    return io.read_dataset(fp)
+
+
+def dump(
+    stats: pd.DataFrame, prop_type: PropertyAlias, dataset_type: DatasetType
+) -> None:
+    fp = prop_utils.get_locality_stats_path(prop_type, dataset_type)
+    io.write_dataset(stats.reset_index(drop=True), fp)
+
+
+def _read_dataset(
+    prop_type: PropertyAlias,
+    dataset_type: DatasetType,
+    cities: list[str] | None = None,
+) -> pd.DataFrame:
+    fp = prop_utils.get_dataset_path(prop_type, dataset_type)
+    columns = [i for i in READ_COLS if i in io.dataset_columns(fp)]
+    filters = None if cities is None else [("CITY", "in", cities)]
+    return io.read_dataset(fp, columns, filters)
+
+
+def update(
+    prop_type: PropertyAlias, dataset_type: DatasetType, cities: np.ndarray
+) -> pd.DataFrame:
+    """
+    Recompute the groups of `cities` only, e.g. after appending their listings. The
+    statistics of a dataset stored before they existed are rebuilt from scratch.
+    """
+    if (old_stats := load(prop_type, dataset_type)) is None:
+        return rebuild(prop_type, dataset_type)
+
+    df = _read_dataset(prop_type, dataset_type, list(cities))
+    stats = build(df, old_stats)
+    dump(stats, prop_type, dataset_type)
+    return stats
+
+
+def rebuild(prop_type: PropertyAlias, dataset_type: DatasetType) -> pd.DataFrame:
+    """Rebuild the statistics from all the listings of the dataset."""
+    stats = build(_read_dataset(prop_type, dataset_type))
+    dump(stats, prop_type, dataset_type)
+    return stats
+
+
+if __name__ == "__main__":
+    from src.property.entity import ALL_PROPERTY
+
+    for dataset_type in ("main", "user"):
+        for prop_type in ALL_PROPERTY:
+            if io.dataset_exists(prop_utils.get_dataset_path(prop_type, dataset_type)):
+                rebuild(prop_type, dataset_type)
+                print(f"Rebuilt locality stats of '{dataset_type}/{prop_type}'.")
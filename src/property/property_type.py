@@ -2,8 +2,9 @@ from abc import ABC, abstractmethod
 
 import pandas as pd
 
+from src.core.partitions import PartitionedDataset
 from src.data.schema_reader import SchemaReader
-from src.property import _utils
+from src.property import _utils, locality_index, locality_stats
 from src.property._utils import get_dataset_path
 from src.typing import DatasetType, PropertyAlias
 
@@ -38,12 +39,32 @@ class PropertyType(ABC):
         dataset_type: DatasetType,
         extend: bool,
     ) -> None:
-        """For now store the data at `data/processed/props` directory."""
+        """
+        Store the data at `data/<dataset_type>/` directory. With `extend` only the
+        new listings are appended as a partition, the stored data is never read.
+        """
         fp = get_dataset_path(self.prop_type, dataset_type)
 
-        if fp.exists() and extend:
-            old_df = pd.read_csv(fp)
-            df = pd.concat([old_df, df], axis="index").drop_duplicates(["PROP_ID"])
+        df = df.assign(PROP_ID="https://99acres.com/" + df["PROP_ID"].str.upper())
 
-        df["PROP_ID"] = "https://99acres.com/" + df["PROP_ID"].str.upper()
-        df.to_csv(fp, index=False)
+        dataset = PartitionedDataset(fp)
+        if extend:
+            df = dataset.append(df)
+            old_index = locality_index.load(self.prop_type, dataset_type)
+        else:
+            dataset.overwrite(df)
+            old_index = None
+
+        if extend and old_index is None:
+            # Dataset stored before its index existed, index its older listings too
+            locality_index.rebuild(self.prop_type, dataset_type)
+        else:
+            locality_index.dump(
+                locality_index.build(df, old_index), self.prop_type, dataset_type
+            )
+
+        # Only the groups of the cities with new listings are recomputed
+        if not extend:
+            locality_stats.dump(locality_stats.build(df), self.prop_type, dataset_type)
+        elif not df.empty:
+            locality_stats.update(self.prop_type, dataset_type, df["CITY"].unique())
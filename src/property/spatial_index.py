@@ -0,0 +1,105 @@
+"""
+Spatial index of the listings of every dataset, for viewport queries of the maps and
+the nearest comparable listings of a property.
+
+The listings are sorted by `LATITUDE`, so a viewport is a binary search followed by
+a `LONGITUDE` mask, and a KD-tree over their unit vectors answers the great-circle
+k-nearest queries. The index is built once per dataset version and kept in memory.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+from src.core import io
+from src.property import _utils as prop_utils
+from src.typing import DatasetType, PropertyAlias
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Columns of the listings returned by the queries, if the dataset has them
+LISTING_COLS = [
+    "PROP_ID",
+    "CITY",
+    "LOCALITY_NAME",
+    "PRICE",
+    "AREA",
+    "BEDROOM_NUM",
+    "LATITUDE",
+    "LONGITUDE",
+]
+
+
+def _unit_vectors(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack(
+        [np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)]
+    )
+
+
+class SpatialIndex:
+    __slots__ = ("listings", "lat", "lon", "tree")
+
+    def __init__(self, listings: pd.DataFrame) -> None:
+        """:listings: Listings with `LATITUDE` and `LONGITUDE`, others are dropped."""
+        self.listings = (
+            listings.dropna(subset=["LATITUDE", "LONGITUDE"])
+            .sort_values("LATITUDE", kind="stable")
+            .reset_index(drop=True)
+        )
+        self.lat = self.listings["LATITUDE"].to_numpy(float)
+        self.lon = self.listings["LONGITUDE"].to_numpy(float)
+        self.tree = cKDTree(_unit_vectors(self.lat, self.lon))
+
+    def __len__(self) -> int:
+        return len(self.listings)
+
+    def viewport(
+        self, south: float, west: float, north: float, east: float
+    ) -> pd.DataFrame:
+        """Listings inside the bounding box, which must not cross the antimeridian."""
+        lo = np.searchsorted(self.lat, south, side="left")
+        hi = np.searchsorted(self.lat, north, side="right")
+        lon = self.lon[lo:hi]
+        return self.listings.iloc[lo:hi][(lon >= west) & (lon <= east)]
+
+    def nearest(
+        self, lat: float, lon: float, k: int = 10, bhk: float | None = None
+    ) -> pd.DataFrame:
+        """
+        `k` nearest listings of the point, with their `DISTANCE_KM`.
+
+        :bhk: Only the listings with this `BEDROOM_NUM` are comparable.
+        """
+        if not len(self):
+            return self.listings.assign(DISTANCE_KM=np.nan)
+
+        point = _unit_vectors(np.array([lat]), np.array([lon]))[0]
+        n = min(k, len(self))
+        while True:
+            chord, pos = self.tree.query(point, k=n)
+            chord, pos = np.atleast_1d(chord), np.atleast_1d(pos)
+            rows = self.listings.iloc[pos].assign(
+                DISTANCE_KM=2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(chord / 2, 1))
+            )
+            if bhk is not None:
+                rows = rows[rows["BEDROOM_NUM"] == bhk]
+            # Widen the search till `k` comparable listings are found
+            if len(rows) >= k or n == len(self):
+                return rows.head(k)
+            n = min(n * 4, len(self))
+
+
+_cache: dict[tuple[PropertyAlias, DatasetType], tuple[str, SpatialIndex]] = {}
+
+
+def load(prop_type: PropertyAlias, dataset_type: DatasetType) -> SpatialIndex:
+    """Index of the dataset of `prop_type`, rebuilt only when the dataset changes."""
+    fp = prop_utils.get_dataset_path(prop_type, dataset_type)
+    version = io.dataset_version(fp)
+
+    key = (prop_type, dataset_type)
+    if (cached := _cache.get(key)) is None or cached[0] != version:
+        columns = [i for i in LISTING_COLS if i in io.dataset_columns(fp)]
+        _cache[key] = cached = (version, SpatialIndex(io.read_dataset(fp, columns)))
+    return cached[1]
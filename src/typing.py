@@ -14,6 +14,7 @@ CAT_COLS_Key: t.TypeAlias = t.Literal["ord_cols", "ohe_cols"]
 
 DatasetType: t.TypeAlias = t.Literal["main", "user"]
 ModelType: t.TypeAlias = t.Literal["price_predictor"]
+EstimatorName: t.TypeAlias = t.Literal["random_forest", "hist_gradient_boosting"]
 
 
 def stop() -> t.NoReturn:
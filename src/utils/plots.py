@@ -0,0 +1,149 @@
+"""
+Plots of the listings whose size is bounded regardless of the number of listings.
+
+Large scatters are sampled or hex binned on the server and rendered with WebGL,
+box plots are drawn from quantiles computed on the server, so only the aggregates
+are sent to the browser.
+"""
+
+from typing import Literal
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+from src.core import constants as C
+
+ScatterMode = Literal["sampled", "density"]
+
+
+def stratified_sample(
+    df: pd.DataFrame,
+    n: int = C.SCATTER_MAX_POINTS,
+    by: str | None = None,
+    seed: int = 42,
+) -> pd.DataFrame:
+    """
+    At most about `n` rows of `df`, every group of `by` keeps its share of rows and
+    at least one row so that small groups are still plotted.
+    """
+    if len(df) <= n:
+        return df
+    if by is None:
+        return df.sample(n, random_state=seed)
+
+    # Keep the first rows of each group of the shuffled `df`, up to its quota
+    df = df.sample(frac=1, random_state=seed)
+    grp = df.groupby(by, dropna=False)[by]
+    quota = (grp.transform("size") * n / len(df)).round().clip(lower=1)
+    return df[grp.cumcount() < quota]
+
+
+def hexbin(
+    x: np.ndarray, y: np.ndarray, gridsize: int = C.HEXBIN_GRIDSIZE
+) -> pd.DataFrame:
+    """
+    Count the points in each cell of a hexagonal grid, same as `plt.hexbin()`.
+
+    :return: Center `x`, `y` and `count` of every non empty hexagon.
+    """
+    mask = np.isfinite(x) & np.isfinite(y)
+    x, y = x[mask], y[mask]
+    if not len(x):
+        return pd.DataFrame({"x": [], "y": [], "count": []})
+
+    nx = gridsize
+    ny = max(1, int(nx / np.sqrt(3)))
+    xmin, xmax, ymin, ymax = x.min(), x.max(), y.min(), y.max()
+    sx = (xmax - xmin) / nx or 1.0
+    sy = (ymax - ymin) / ny or 1.0
+
+    # Hexagon centers lie on two rectangular lattices, offset by half a cell
+    ix, iy = (x - xmin) / sx, (y - ymin) / sy
+    ix1, iy1 = np.round(ix), np.round(iy)
+    ix2, iy2 = np.floor(ix) + 0.5, np.floor(iy) + 0.5
+    on_first = (ix - ix1) ** 2 + 3 * (iy - iy1) ** 2 < (
+        (ix - ix2) ** 2 + 3 * (iy - iy2) ** 2
+    )
+
+    cx = xmin + np.where(on_first, ix1, ix2) * sx
+    cy = ymin + np.where(on_first, iy1, iy2) * sy
+    return pd.DataFrame({"x": cx, "y": cy}).value_counts().rename("count").reset_index()
+
+
+def scatter(
+    df: pd.DataFrame,
+    x: str,
+    y: str,
+    color: str | None = None,
+    hover_name: str | None = None,
+    mode: ScatterMode = "sampled",
+) -> go.Figure:
+    """
+    Scatter plot of `df`, sampled by `color` or hex binned when `df` has more than
+    `C.SCATTER_MAX_POINTS` rows.
+    """
+    if mode == "density" and len(df) > C.SCATTER_MAX_POINTS:
+        bins = hexbin(df[x].to_numpy(float), df[y].to_numpy(float))
+        fig = go.Figure(
+            go.Scattergl(
+                x=bins["x"],
+                y=bins["y"],
+                mode="markers",
+                marker={
+                    "symbol": "hexagon",
+                    "size": 12,
+                    "color": np.log10(bins["count"]),
+                    "colorscale": "Viridis",
+                    "colorbar": {"title": "log10(count)"},
+                },
+                customdata=bins["count"],
+                hovertemplate="%{customdata} listings<extra></extra>",
+            )
+        )
+        return fig.update_layout(xaxis_title=x, yaxis_title=y)
+
+    df = stratified_sample(df, by=color)
+    render_mode = "webgl" if len(df) > C.WEBGL_MIN_POINTS else "svg"
+    return px.scatter(
+        df, x=x, y=y, color=color, hover_name=hover_name, render_mode=render_mode
+    )
+
+
+def box_stats(df: pd.DataFrame, x: str | None, y: str) -> pd.DataFrame:
+    """Quantiles and Tukey fences of `y` for each group of `x`."""
+    key = x or "_ALL"
+    df = df.assign(_ALL=y) if x is None else df
+    grp = df.groupby(key)[y]
+
+    stats = grp.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ["q1", "median", "q3"]
+    stats["mean"] = grp.mean()
+
+    # Fences are the furthest values within 1.5 IQR, the same as of `px.box()`
+    iqr = stats["q3"] - stats["q1"]
+    lo = df[key].map(stats["q1"] - 1.5 * iqr)
+    hi = df[key].map(stats["q3"] + 1.5 * iqr)
+    inside = df[df[y].between(lo, hi)].groupby(key)[y]
+    stats["lowerfence"] = inside.min()
+    stats["upperfence"] = inside.max()
+    return stats
+
+
+def box(df: pd.DataFrame, x: str | None, y: str) -> go.Figure:
+    """Box plot of `y` by `x` drawn from `box_stats()`, without the raw points."""
+    stats = box_stats(df, x, y)
+    fig = go.Figure(
+        go.Box(
+            x=stats.index.astype(str).tolist(),
+            q1=stats["q1"],
+            median=stats["median"],
+            q3=stats["q3"],
+            mean=stats["mean"],
+            lowerfence=stats["lowerfence"],
+            upperfence=stats["upperfence"],
+            name=y,
+        )
+    )
+    return fig.update_layout(xaxis_title=x, yaxis_title=y)
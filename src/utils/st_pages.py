@@ -1,6 +1,28 @@
 """Functions for streamlit app's pages."""
 
+import functools
+import threading
+import time
+from typing import Callable, ParamSpec, TypeVar
+
 import pandas as pd
+import streamlit as st
+from pydantic import BaseModel
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Session state key of the `CacheTiming`s of the current run
+CACHE_TIMINGS = "CACHE_TIMINGS"
+
+_local = threading.local()
+
+
+class CacheTiming(BaseModel):
+    func: str
+    hit: bool
+    hash_ms: float
+    compute_ms: float
 
 
 def decorate_options(x):
@@ -29,3 +51,43 @@ def format_price(price: float) -> str:
 
 def get_center_lat_lon(df: pd.DataFrame) -> dict[str, float]:
     return {"lat": df["LATITUDE"].median(), "lon": df["LONGITUDE"].median()}
+
+
+def timed_cache_data(func: Callable[P, R]) -> Callable[P, R]:
+    """
+    `st.cache_data` which records a `CacheTiming` of every call into the session
+    state. `hash_ms` is the time spent outside of `func`, i.e. hashing the arguments
+    and looking up or storing the cached value.
+    """
+
+    @functools.wraps(func)
+    def compute(*args: P.args, **kwargs: P.kwargs) -> R:
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.compute_s += time.perf_counter() - start
+
+    cached = st.cache_data(compute)
+
+    @functools.wraps(func)
+    def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        # Calls may be nested, the outer call measures the inner ones as compute
+        outer_compute_s = getattr(_local, "compute_s", 0.0)
+        _local.compute_s = 0.0
+        start = time.perf_counter()
+        try:
+            return cached(*args, **kwargs)
+        finally:
+            total_s = time.perf_counter() - start
+            compute_s, _local.compute_s = _local.compute_s, outer_compute_s
+            st.session_state.setdefault(CACHE_TIMINGS, []).append(
+                CacheTiming(
+                    func=func.__name__,
+                    hit=compute_s == 0.0,
+                    hash_ms=(total_s - compute_s) * 1e3,
+                    compute_ms=compute_s * 1e3,
+                )
+            )
+
+    return wrapper